@@ -15,6 +15,53 @@ export const createDetection = async (req, res) => {
     }
 };
 
+// Bad input is the client's fault (400); anything else (DB down, buffering timeout) is worth retrying (5xx)
+const isInvalidInput = (error) => error?.name === 'ValidationError' || error?.name === 'CastError';
+
+// Per-item outcome from insertMany: the stored document, or a validation / write error
+const isFailure = (result) => result instanceof Error || typeof result?.errmsg === 'string';
+
+export const createDetectionsBulk = async (req, res) => {
+    const items = Array.isArray(req.body) ? req.body : req.body?.detections;
+    if (!Array.isArray(items) || items.length === 0) {
+        return res.status(400).json({ success: false, error: 'Expected a non-empty array of detections' });
+    }
+
+    // Unordered: invalid items are skipped and reported instead of failing the batch halfway through
+    let results;
+    try {
+        const result = await Detection.insertMany(items, { ordered: false, rawResult: true });
+        results = result.mongoose?.results ?? [];
+    } catch (error) {
+        if (Array.isArray(error.results)) {
+            results = error.results; // per-document write errors; the rest of the batch is stored
+        } else if (Array.isArray(error.writeErrors)) {
+            results = items.map(() => null);
+            for (const writeError of error.writeErrors) {
+                results[writeError.index] = writeError;
+            }
+        } else {
+            return res.status(isInvalidInput(error) ? 400 : 500).json({ success: false, error: error.message });
+        }
+    }
+
+    const failed = [];
+    let count = 0;
+    results.forEach((result, index) => {
+        if (isFailure(result)) {
+            failed.push({ index, error: result.message ?? result.errmsg });
+        } else if (result) {
+            count += 1;
+            // Track threat logic
+            notificationService.trackDetection(result);
+        }
+    });
+
+    // failed: indexes into the request the server will never accept (do not resend them)
+    const status = count === 0 && failed.length > 0 ? 400 : 201;
+    res.status(status).json({ success: status === 201, count, failed });
+};
+
 export const getDetections = async (req, res) => {
     try {
         const detections = await Detection.find().sort({ timestamp: -1 }).limit(50);
@@ -1,9 +1,10 @@
 import express from 'express';
-import { createDetection, getDetections, getDetectionsByVideo } from './detections.controller.js'
+import { createDetection, createDetectionsBulk, getDetections, getDetectionsByVideo } from './detections.controller.js'
 
 const router = express.Router();
 
 router.post('/', createDetection);
+router.post('/bulk', createDetectionsBulk);
 router.get('/', getDetections);
 router.get('/video/:videoId', getDetectionsByVideo);
 
@@ -1,5 +1,6 @@
 import os
 import sys
+import time
 import uvicorn
 from fastapi import FastAPI, File, UploadFile, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
@@ -9,8 +10,22 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from inference import DiseaseClassifier
 
+# Shared helpers live in Models/common
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.metrics import ServiceMetrics, metrics_router
+from common.uploads import UploadLimitMiddleware, mb_env, spool_upload
+
 app = FastAPI()
 
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DISEASE_MODEL_PATH = os.path.join(BASE_DIR, "protonet_conv4_encoder.keras")
+SUPPORT_SET_DIR = os.path.join(BASE_DIR, "support_set")
+
+# Larger uploads get 413 before the body is read
+MAX_UPLOAD_BYTES = mb_env("MAX_UPLOAD_MB", 20)
+app.add_middleware(UploadLimitMiddleware, max_bytes=MAX_UPLOAD_BYTES)
+
+# Added last so CORS wraps everything, including early 413s
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -19,13 +34,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DISEASE_MODEL_PATH = os.path.join(BASE_DIR, "protonet_conv4_encoder.keras")
-SUPPORT_SET_DIR = os.path.join(BASE_DIR, "support_set")
+# Stage timings, images and model load time on GET /metrics
+metrics = ServiceMetrics("disease")
+app.include_router(metrics_router())
 
 print("Starting Disease Detection Service...")
 try:
-    classifier = DiseaseClassifier(DISEASE_MODEL_PATH, SUPPORT_SET_DIR)
+    _t0 = time.perf_counter()
+    classifier = DiseaseClassifier(DISEASE_MODEL_PATH, SUPPORT_SET_DIR, metrics=metrics)
+    metrics.model_loaded("protonet_conv4", time.perf_counter() - _t0)
 except Exception as e:
     print(f"Failed to initialize classifier: {e}")
     classifier = None
@@ -35,12 +52,17 @@ def health_check():
     return {"status": "Disease Detection Service Running", "model_loaded": classifier is not None}
 
 @app.post("/classify")
-async def classify_health(file: UploadFile = File(...)):
+def classify_health(file: UploadFile = File(...)):
     if not classifier:
         raise HTTPException(status_code=503, detail="Model not initialized")
     
-    content = await file.read()
-    result = classifier.classify(content)
+    # Stream the upload to disk in chunks and decode from there
+    tmp_path, _, _ = spool_upload(file, MAX_UPLOAD_BYTES)
+    try:
+        result = classifier.classify(tmp_path)
+    finally:
+        os.remove(tmp_path)
+    metrics.frames(kind="image")
     
     if "error" in result:
         raise HTTPException(status_code=500, detail=result["error"])
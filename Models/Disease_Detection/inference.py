@@ -3,6 +3,7 @@ import numpy as np
 import os
 import cv2
 import traceback
+from contextlib import nullcontext
 
 # Define constants
 IMG_SIZE = 224
@@ -10,9 +11,11 @@ CLASS_NAMES = ["fp", "healthy", "barnacles"]
 EMBEDDING_DIM = 128
 
 class DiseaseClassifier:
-    def __init__(self, model_path, support_set_dir=None):
+    def __init__(self, model_path, support_set_dir=None, metrics=None):
         self.model_path = model_path
         self.support_set_dir = support_set_dir
+        # optional common.metrics.ServiceMetrics: decode / forward timings
+        self.metrics = metrics
         self.model = None
         self.prototypes = None
         print(f"Initializing DiseaseClassifier with model: {model_path}")
@@ -27,6 +30,9 @@ class DiseaseClassifier:
         else:
             print("Skipping support set loading - Model not available.")
 
+    def _stage(self, name):
+        return self.metrics.stage(name) if self.metrics else nullcontext()
+
     def build_conv4_encoder(self):
         """Reconstruct the model architecture to load weights safely"""
         try:
@@ -148,10 +154,12 @@ class DiseaseClassifier:
         self.prototypes = rng.normal(size=(3, EMBEDDING_DIM))
         self.prototypes = self.prototypes / np.linalg.norm(self.prototypes, axis=1, keepdims=True)
 
-    def preprocess(self, image_bytes):
-        # Decode
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    def preprocess(self, image):
+        # Decode (a file path, e.g. a spooled upload, or raw encoded bytes)
+        if isinstance(image, str):
+            img = cv2.imread(image, cv2.IMREAD_COLOR)
+        else:
+            img = cv2.imdecode(np.frombuffer(image, np.uint8), cv2.IMREAD_COLOR)
         if img is None:
             raise ValueError("Could not decode image")
         
@@ -161,7 +169,7 @@ class DiseaseClassifier:
         img = img.astype(np.float32) / 255.0
         return np.expand_dims(img, axis=0) # Batch dimension
 
-    def classify(self, image_bytes):
+    def classify(self, image):
         print("Classifying image...")
         if not self.model:
             print("Error: Model not loaded")
@@ -173,13 +181,15 @@ class DiseaseClassifier:
 
         try:
             # Preprocess
-            img_tensor = self.preprocess(image_bytes)
+            with self._stage("decode"):
+                img_tensor = self.preprocess(image)
             print(f"Preprocessed shape: {img_tensor.shape}")
             
             # Get Embedding - Use __call__ instead of predict for serving
-            embedding = self.model(img_tensor, training=False)
-            # Convert to numpy
-            embedding = embedding.numpy()
+            with self._stage("forward"):
+                embedding = self.model(img_tensor, training=False)
+                # Convert to numpy
+                embedding = embedding.numpy()
             
             # Compute Euclidean distances to prototypes
             dists = []
@@ -1,23 +1,32 @@
 import cv2
 import numpy as np
 import os
+import sys
 import requests
 import time
 from datetime import datetime
 from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
-from ultralytics import YOLO
 from collections import defaultdict, deque, Counter
 
+# Shared helpers live in Models/common
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.backends import load_yolo
+from common.metrics import CONTENT_TYPE_LATEST, ServiceMetrics, render
+from common.roi import ROI, roi_spec
+
 app = Flask(__name__)
 CORS(app)  
 
 # CONFIG
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-MODEL_PATH = os.path.join(BASE_DIR, "models", "best.pt")
+MODEL_PATH = os.getenv("HATCHERY_MODEL_PATH", os.path.join(BASE_DIR, "models", "best.pt"))
 VIDEO_DIR = os.path.join(BASE_DIR, "test_videos")
 NODE_API_URL = "http://localhost:5002/api/hatchery"
 
+# Stage timings, frames and model load times on GET /metrics
+metrics = ServiceMetrics("hatchery")
+
 # CONSTANTS
 PIXELS_PER_CM = 25.0
 WALL_MARGIN = 100
@@ -25,6 +34,10 @@ BL_THRESHOLD = 0.5
 CONFIRMATION_WINDOW = 45
 FRAME_SKIP = 3
 
+# Per-tank ROI from ROI_CONFIG (see common/roi.py); with this set, tanks without
+# one are cropped to the safe zone inside WALL_MARGIN before inference
+CROP_TO_SAFE_ZONE = os.getenv("HATCHERY_CROP_TO_SAFE_ZONE", "0") == "1"
+
 DEFAULT_TANK_CONFIG = {
     "tankA": os.path.join(VIDEO_DIR, "IMG_3149.MOV"),
     "tankB": os.path.join(VIDEO_DIR, "IMG_3150.MOV"),
@@ -37,7 +50,8 @@ class VideoController:
     def __init__(self):
         print("AI Engine Starting...")
 
-        # One YOLO model per video_id (tank) to avoid shared-state bottlenecks
+        # One YOLO model per video_id (tank) to avoid shared-state bottlenecks;
+        # load_yolo serves best.pt on INFERENCE_BACKEND (pytorch | onnx | openvino)
         self.models = {}
 
         self.video_sources = DEFAULT_TANK_CONFIG.copy()
@@ -49,10 +63,16 @@ class VideoController:
         for tid in self.video_sources.keys():
             self._init_tank_state(tid)
             print(f"Loading YOLO model for {tid}...")
-            self.models[tid] = YOLO(MODEL_PATH)
+            self.models[tid] = self._load_model(tid)
 
         print("All models loaded successfully")
 
+    def _load_model(self, video_id):
+        t0 = time.perf_counter()
+        model = load_yolo(MODEL_PATH)
+        metrics.model_loaded(video_id, time.perf_counter() - t0)
+        return model
+
     def _init_tank_state(self, video_id):
         self.states[video_id] = {
             "status": "Initializing",
@@ -70,7 +90,7 @@ class VideoController:
         """Register a newly uploaded video"""
         self.video_sources[video_id] = path
         self._init_tank_state(video_id)
-        self.models[video_id] = YOLO(MODEL_PATH)
+        self.models[video_id] = self._load_model(video_id)
         print(f"Registered new video: {video_id}")
 
     def generate_frames(self, video_id):
@@ -91,10 +111,12 @@ class VideoController:
         w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
         h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         safe_zone = [WALL_MARGIN, WALL_MARGIN, w - WALL_MARGIN, h - WALL_MARGIN]
+        spec = roi_spec(video_id) or ({"margin": WALL_MARGIN} if CROP_TO_SAFE_ZONE else None)
+        roi = ROI.from_spec(spec, w, h)
 
         model = self.models.get(video_id)
         if model is None:
-            self.models[video_id] = YOLO(MODEL_PATH)
+            self.models[video_id] = self._load_model(video_id)
             model = self.models[video_id]
 
         frame_count = 0
@@ -104,7 +126,8 @@ class VideoController:
 
         while cap.isOpened():
             start_time = time.time()
-            success, frame = cap.read()
+            with metrics.stage("decode"):
+                success, frame = cap.read()
 
             if not success:
                 # Loop video
@@ -113,19 +136,25 @@ class VideoController:
 
             # Run inference only on every FRAME_SKIP frames
             if frame_count % FRAME_SKIP == 0:
-                results = model.track(frame, persist=True, conf=0.5, verbose=False)
+                with metrics.stage("forward"):
+                    # Tracking needs one fixed view, so the ROI is cropped but never tiled here
+                    results = model.track(frame if roi is None else roi.crop(frame),
+                                          persist=True, conf=0.5, verbose=False)
+                metrics.frames(kind="inferred")
                 if results and len(results) > 0:
                     last_result = results[0]
 
             # Draw using cached result so boxes don't disappear on skipped frames
             if last_result is not None:
-                self._process(last_result, frame, video_id, safe_zone, fps, model)
+                with metrics.stage("tracking"):
+                    self._process(last_result, frame, video_id, safe_zone, fps, model, roi)
 
             frame_count += 1
 
             # Stream resized frame
-            small_frame = cv2.resize(frame, (640, int(h * (640 / w))))
-            ok, buffer = cv2.imencode(".jpg", small_frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
+            with metrics.stage("jpeg"):
+                small_frame = cv2.resize(frame, (640, int(h * (640 / w))))
+                ok, buffer = cv2.imencode(".jpg", small_frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
             if not ok:
                 continue
 
@@ -138,8 +167,8 @@ class VideoController:
             if wait > 0:
                 time.sleep(wait)
 
-    def _process(self, result, frame, video_id, safe_zone, fps, model):
-        """Process detection results and draw boxes"""
+    def _process(self, result, frame, video_id, safe_zone, fps, model, roi=None):
+        """Process detection results and draw boxes (`roi`: result is on its crop)"""
         if result.boxes is None:
             return
 
@@ -156,9 +185,14 @@ class VideoController:
         frame_species = set()
         frame_statuses = []
 
+        ox, oy = roi.bounds[:2] if roi is not None else (0, 0)
+
         for i, (box, cls) in enumerate(zip(boxes_xywh, classes)):
             x, y, w, h = box
+            x, y = x + ox, y + oy
             cx, cy = float(x), float(y)
+            if roi is not None and not roi.contains(cx, cy):
+                continue
 
             species = names[int(cls)]
             frame_species.add(species)
@@ -251,11 +285,12 @@ class VideoController:
 
             # 2. Save to Node.js database
             try:
-                response = requests.post(
-                    f"{NODE_API_URL}/alerts/new", 
-                    json=payload, 
-                    timeout=2
-                )
+                with metrics.stage("node_post"):
+                    response = requests.post(
+                        f"{NODE_API_URL}/alerts/new", 
+                        json=payload, 
+                        timeout=2
+                    )
                 if response.status_code == 201:
                     print(f"Alert saved to DB: {tank_id} - {message}")
                 else:
@@ -310,6 +345,12 @@ def register_upload():
     return jsonify({"status": "registered"}), 200
 
 
+@app.route("/metrics")
+def metrics_endpoint():
+    """Prometheus scrape endpoint"""
+    return Response(render(), mimetype=CONTENT_TYPE_LATEST)
+
+
 @app.route("/health")
 def health():
     """Health check endpoint"""
@@ -1,10 +1,17 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException
-from ultralytics import YOLO
 import shutil
 import os
 import uuid
+import sys
+import time
 import cv2
 
+# Shared helpers live in Models/common
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.backends import load_yolo
+from common.motion import MotionGate
+from common.metrics import ServiceMetrics, metrics_router
+
 app = FastAPI()
 
 MODEL_PATH = "models/human.pt"
@@ -14,7 +21,14 @@ OUTPUT_DIR = "outputs"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-model = YOLO(MODEL_PATH)
+# Stage timings, frames and model load time on GET /metrics
+metrics = ServiceMetrics("human")
+app.include_router(metrics_router())
+
+# Served on INFERENCE_BACKEND (pytorch | onnx | openvino)
+_t0 = time.perf_counter()
+model = load_yolo(MODEL_PATH)
+metrics.model_loaded("human", time.perf_counter() - _t0)
 
 @app.post("/detect-video")
 async def detect_video(file: UploadFile = File(...)):
@@ -40,21 +54,31 @@ async def detect_video(file: UploadFile = File(...)):
 
     total_frames = 0
     person_count = 0
+    # With MOTION_THRESHOLD set, static frames (no motion since the last inferred one) reuse its results
+    gate = MotionGate()
 
     while True:
-        ret, frame = cap.read()
+        with metrics.stage("decode"):
+            ret, frame = cap.read()
         if not ret:
             break
 
-        results = model(frame, conf=0.4, classes=[0])  # 0 = person
+        if gate.should_run(frame):
+            with metrics.stage("forward"):
+                results = model(frame, conf=0.4, classes=[0])  # 0 = person
+            metrics.frames(kind="inferred")
+        else:
+            metrics.frames(kind="gated")
 
         for r in results:
             boxes = r.boxes
             if boxes is not None:
                 person_count += len(boxes)
 
-        annotated = results[0].plot()
-        out.write(annotated)
+        with metrics.stage("annotate"):
+            annotated = results[0].plot(img=frame)
+        with metrics.stage("video_write"):
+            out.write(annotated)
         total_frames += 1
 
     cap.release()
@@ -64,5 +88,7 @@ async def detect_video(file: UploadFile = File(...)):
         "message": "Human detection completed",
         "frames_processed": total_frames,
         "persons_detected": person_count,
+        "frames_inferred": gate.executed,
+        "frames_gated": gate.gated,
         "output_video": output_path
     }
@@ -1,15 +1,25 @@
 import os
+import sys
 import shutil
+import threading
+import time
 import uuid
 import tempfile
 from typing import List, Dict, Any
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query, Request
 from pydantic import BaseModel
-from ultralytics import YOLO
 import cv2
 import numpy as np
 
+# Shared helpers live in Models/common
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.jobs import JobManager, job_router, submit_or_429
+from common.media import ranged_file_response
+from common.columnar import detection_columns, encode_response
+from common.backends import load_yolo
+from common.motion import MotionGate
+from common.metrics import ServiceMetrics, metrics_router
+
 # ---------- CONFIG ----------
 MODEL_PATH = "models/predator.pt"      # <--- point to your trained .pt file
 OUTPUT_DIR = "outputs"             # where annotated videos & reports are saved
@@ -23,15 +33,29 @@ os.makedirs(OUTPUT_DIR, exist_ok=True)
 # ---------- App ----------
 app = FastAPI(title="Predator Detector API")
 
+# Stage timings, frames, queue depth and model load time on GET /metrics
+metrics = ServiceMetrics("predator")
+
 # Load model (single global instance)
 device = 0 if USE_GPU else "cpu"
 try:
-    model = YOLO(MODEL_PATH)
+    # Served on INFERENCE_BACKEND (pytorch | onnx | openvino)
+    _t0 = time.perf_counter()
+    model = load_yolo(MODEL_PATH)
+    metrics.model_loaded("predator", time.perf_counter() - _t0)
 except Exception as e:
     # if loading fails, raise when endpoint called - but still start app
     model = None
     print("Warning: model failed to load at startup:", e)
 
+# YOLO predictors are not thread-safe; requests and jobs share this instance
+model_lock = threading.Lock()
+
+jobs = JobManager()
+app.include_router(job_router(jobs, prefix="/jobs/predator"))
+metrics.track_queue("jobs", jobs.pending)
+app.include_router(metrics_router())
+
 
 # ---------- Response schemas ----------
 class Detection(BaseModel):
@@ -48,6 +72,8 @@ class VideoReport(BaseModel):
     processed_frames: int
     total_detections: int
     predator_present: bool
+    inferred_frames: int = 0       # frames the model actually ran on
+    gated_frames: int = 0          # static frames that reused the previous result
     detections: List[Detection]
     annotated_video_path: str
 
@@ -68,10 +94,13 @@ def save_upload_temp(upload_file: UploadFile) -> str:
     return tmp_path
 
 
-def annotate_and_process(video_path: str, out_path: str, frame_step:int = 1) -> Dict[str, Any]:
+def annotate_and_process(video_path: str, out_path: str, frame_step:int = 1, progress=None) -> Dict[str, Any]:
     """
     Run detection on video and write an annotated output video.
     Returns a dictionary with per-frame detections and summary info.
+    `progress(fraction)` is called after every processed frame when given.
+    With MOTION_THRESHOLD set (off by default), frames with no motion since
+    the last inferred one reuse its detections instead of running the model.
     """
     ensure_model()
 
@@ -92,90 +121,103 @@ def annotate_and_process(video_path: str, out_path: str, frame_step:int = 1) ->
     processed_frames = 0
     frame_idx = 0
     predator_present_any = False
+    gate = MotionGate()
+    r = None  # last inference result, reused on gated frames
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        if frame_idx % frame_step == 0:
-            processed_frames += 1
-            # run model on the frame (Ultralytics accepts numpy arrays)
-            results = model(frame, verbose=False)  # returns a Results object (list-like)
-            r = results[0]
-
-            boxes = []
-            scores = []
-            classes = []
-
-            # Ultralytics v8: r.boxes contains Boxes with .xyxy, .conf, .cls
-            if hasattr(r, 'boxes') and r.boxes is not None:
-                xyxy = r.boxes.xyxy.cpu().numpy() if hasattr(r.boxes, "xyxy") else None
-                confs = r.boxes.conf.cpu().numpy() if hasattr(r.boxes, "conf") else None
-                clss = r.boxes.cls.cpu().numpy() if hasattr(r.boxes, "cls") else None
-
-                if xyxy is not None:
-                    for i in range(xyxy.shape[0]):
-                        score = float(confs[i]) if confs is not None else 1.0
-                        cls_id = int(clss[i]) if clss is not None else 0
-                        if score < CONFIDENCE_THRESHOLD:
-                            continue
-                        x1, y1, x2, y2 = xyxy[i].tolist()
-                        boxes.append([x1, y1, x2, y2])
-                        scores.append(score)
-                        # Map class id to name (fallback to string id)
-                        cls_name = TARGET_CLASS_NAMES[cls_id] if cls_id < len(TARGET_CLASS_NAMES) else str(cls_id)
-                        classes.append(cls_name)
-
-                        # draw rectangle and label on frame
-                        color = (0, 0, 255)
-                        BOX_THICKNESS = 4
-                        FONT_SCALE = 0.8
-                        FONT_THICKNESS = 2
-
-                        # Draw thicker rectangle
-                        cv2.rectangle(
-                            frame,
-                            (int(x1), int(y1)),
-                            (int(x2), int(y2)),
-                            color,
-                            BOX_THICKNESS
-                        )
-
-                        # Draw bigger text
-                        label = f"{cls_name} {score:.2f}"
-                        cv2.putText(
-                            frame,
-                            label,
-                            (int(x1), int(y1) - 10),
-                            cv2.FONT_HERSHEY_SIMPLEX,
-                            FONT_SCALE,
-                            color,
-                            FONT_THICKNESS
-                        )
-
-            # check if any predator found in this frame
-            found_predator = any([c == "predator" for c in classes])
-            if found_predator:
-                predator_present_any = True
-
-            total_detections += len(boxes)
-
-            timestamp_s = frame_idx / fps if fps > 0 else 0.0
-            detections_out.append({
-                "frame_idx": frame_idx,
-                "timestamp_s": float(timestamp_s),
-                "boxes": boxes,
-                "scores": scores,
-                "classes": classes
-            })
-
-        # write annotated frame anyway (so output video length equals input)
-        writer.write(frame)
-        frame_idx += 1
-
-    cap.release()
-    writer.release()
+    try:
+        while True:
+            with metrics.stage("decode"):
+                ret, frame = cap.read()
+            if not ret:
+                break
+
+            if frame_idx % frame_step == 0:
+                processed_frames += 1
+                # run model on the frame (Ultralytics accepts numpy arrays)
+                if gate.should_run(frame):
+                    with model_lock, metrics.stage("forward"):
+                        results = model(frame, verbose=False)  # returns a Results object (list-like)
+                    r = results[0]
+                    metrics.frames(kind="inferred")
+                else:
+                    metrics.frames(kind="gated")
+
+                boxes = []
+                scores = []
+                classes = []
+
+                # Ultralytics v8: r.boxes contains Boxes with .xyxy, .conf, .cls
+                if hasattr(r, 'boxes') and r.boxes is not None:
+                    xyxy = r.boxes.xyxy.cpu().numpy() if hasattr(r.boxes, "xyxy") else None
+                    confs = r.boxes.conf.cpu().numpy() if hasattr(r.boxes, "conf") else None
+                    clss = r.boxes.cls.cpu().numpy() if hasattr(r.boxes, "cls") else None
+
+                    if xyxy is not None:
+                        for i in range(xyxy.shape[0]):
+                            score = float(confs[i]) if confs is not None else 1.0
+                            cls_id = int(clss[i]) if clss is not None else 0
+                            if score < CONFIDENCE_THRESHOLD:
+                                continue
+                            x1, y1, x2, y2 = xyxy[i].tolist()
+                            boxes.append([x1, y1, x2, y2])
+                            scores.append(score)
+                            # Map class id to name (fallback to string id)
+                            cls_name = TARGET_CLASS_NAMES[cls_id] if cls_id < len(TARGET_CLASS_NAMES) else str(cls_id)
+                            classes.append(cls_name)
+
+                            # draw rectangle and label on frame
+                            color = (0, 0, 255)
+                            BOX_THICKNESS = 4
+                            FONT_SCALE = 0.8
+                            FONT_THICKNESS = 2
+
+                            # Draw thicker rectangle
+                            cv2.rectangle(
+                                frame,
+                                (int(x1), int(y1)),
+                                (int(x2), int(y2)),
+                                color,
+                                BOX_THICKNESS
+                            )
+
+                            # Draw bigger text
+                            label = f"{cls_name} {score:.2f}"
+                            cv2.putText(
+                                frame,
+                                label,
+                                (int(x1), int(y1) - 10),
+                                cv2.FONT_HERSHEY_SIMPLEX,
+                                FONT_SCALE,
+                                color,
+                                FONT_THICKNESS
+                            )
+
+                # check if any predator found in this frame
+                found_predator = any([c == "predator" for c in classes])
+                if found_predator:
+                    predator_present_any = True
+
+                total_detections += len(boxes)
+
+                timestamp_s = frame_idx / fps if fps > 0 else 0.0
+                detections_out.append({
+                    "frame_idx": frame_idx,
+                    "timestamp_s": float(timestamp_s),
+                    "boxes": boxes,
+                    "scores": scores,
+                    "classes": classes
+                })
+
+                if progress and total_frames > 0:
+                    progress(frame_idx / total_frames)
+
+            # write annotated frame anyway (so output video length equals input)
+            with metrics.stage("video_write"):
+                writer.write(frame)
+            frame_idx += 1
+    finally:
+        cap.release()
+        writer.release()
 
     return {
         "video_filename": os.path.basename(video_path),
@@ -183,15 +225,38 @@ def annotate_and_process(video_path: str, out_path: str, frame_step:int = 1) ->
         "processed_frames": processed_frames,
         "total_detections": total_detections,
         "predator_present": predator_present_any,
+        "inferred_frames": gate.executed,
+        "gated_frames": gate.gated,
         "detections": detections_out
     }
 
 
+def run_detection(tmp_video: str, progress=None) -> Dict[str, Any]:
+    """Annotate a saved upload, then remove its temp directory."""
+    # create output path
+    out_name = f"{uuid.uuid4().hex}_annotated.mp4"
+    out_path = os.path.join(OUTPUT_DIR, out_name)
+
+    try:
+        result = annotate_and_process(tmp_video, out_path, frame_step=FRAME_STEP, progress=progress)
+        # attach the path to annotated video in the result
+        result["annotated_video_path"] = out_path
+        return result
+    finally:
+        # cleanup uploaded temp directory
+        try:
+            shutil.rmtree(os.path.dirname(tmp_video))
+        except Exception:
+            pass
+
+
 # ---------- API Endpoints ----------
 @app.post("/detect-video/predator", response_model=VideoReport)
-async def detect_video(file: UploadFile = File(...)):
+def detect_video(request: Request, file: UploadFile = File(...), columnar: bool = Query(False)):
     """
     Upload a video and get detection report + annotated output video path.
+    ?columnar=true (or Accept: application/x-msgpack / application/x-npz) returns
+    `columns` (flat per-box arrays + per-frame offsets) instead of `detections`.
     """
     if not file.filename:
         raise HTTPException(status_code=400, detail="No file uploaded")
@@ -202,35 +267,44 @@ async def detect_video(file: UploadFile = File(...)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to save upload: {e}")
 
-    # create output path
-    out_name = f"{uuid.uuid4().hex}_annotated.mp4"
-    out_path = os.path.join(OUTPUT_DIR, out_name)
-
     try:
-        result = annotate_and_process(tmp_video, out_path, frame_step=FRAME_STEP)
-        # attach the path to annotated video in the result
-        result["annotated_video_path"] = out_path
+        result = run_detection(tmp_video)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return encode_response(request, result, lambda r: detection_columns(r, TARGET_CLASS_NAMES), columnar=columnar)
 
-        # cleanup uploaded temp directory
-        try:
-            shutil.rmtree(os.path.dirname(tmp_video))
-        except Exception:
-            pass
 
-        return JSONResponse(content=result)
+@app.post("/jobs/detect-video/predator")
+def submit_detect_video_job(file: UploadFile = File(...)):
+    """
+    Queue a detection run; poll GET /jobs/predator/{job_id} and fetch GET /jobs/predator/{job_id}/result.
+    """
+    if not file.filename:
+        raise HTTPException(status_code=400, detail="No file uploaded")
+
+    try:
+        tmp_video = save_upload_temp(file)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=500, detail=f"Failed to save upload: {e}")
+
+    try:
+        return submit_or_429(jobs, "detect-video", run_detection, tmp_video)
+    except HTTPException:
+        # Queue full: the job (whose own cleanup would remove the upload) never runs
+        shutil.rmtree(os.path.dirname(tmp_video), ignore_errors=True)
+        raise
 
 
 @app.get("/download/predator/{filename}")
-def download_file(filename: str):
+def download_file(filename: str, request: Request):
     """
     Download an annotated video by filename (the client should previously get the path).
+    Supports Range requests (206) and If-None-Match / If-Modified-Since (304).
     """
     file_path = os.path.join(OUTPUT_DIR, filename)
     if not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="File not found")
-    return FileResponse(file_path, media_type="video/mp4", filename=filename)
+    return ranged_file_response(request, file_path, media_type="video/mp4", filename=filename)
 
 
 @app.get("/predator/")
@@ -1,31 +1,40 @@
 # app.py
 import os
+import shutil
+import sys
+import threading
+import time
 import cv2
 import numpy as np
-from tempfile import NamedTemporaryFile
+from itertools import islice
+from typing import List, Literal, Optional
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, Request
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 
 from dotenv import load_dotenv
 
-from models.shoreline.model import ShorelineModel, Settings
+# Shared helpers live in Models/common
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.shoreline.model import ShorelineModel, Settings, MASK_FORMATS, MaskKeyframes
 from models.shoreline.schemas import Health  # ✅ Prediction schema likely needs update for mask
 
+from common.jobs import JobCancelled, JobManager, JobQueueFull, job_router, submit_or_429
+from common.streaming import stream_events
+from common.cache import ResultCache
+from common.backends import INFERENCE_BACKEND, INFERENCE_INT8
+from common.metrics import ServiceMetrics, metrics_router
+from common.pages import PageStore
+from common.uploads import UploadLimitMiddleware, mb_env, spool_upload
+from common.video import FrameSampler, AdaptiveStride, idle_stride, ADAPTIVE_IDLE_FPS
+
 load_dotenv()
 
 app = FastAPI(title="TurtleGuard Shoreline Inference (Segmentation)")
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
 MODEL_PATH = os.getenv("MODEL_PATH", "./models/shoreline/shoreline_seg_best.pt")
 
 
@@ -53,6 +62,64 @@ settings = Settings(
 model_loaded = False
 model = None
 
+jobs = JobManager()
+app.include_router(job_router(jobs))
+
+# GET /metrics: stage timings, frames, queue depth, model load time
+metrics = ServiceMetrics("shoreline")
+metrics.track_queue("jobs", jobs.pending)
+app.include_router(metrics_router())
+
+# ✅ batched inference: frames per forward pass in /predict-video, images per /predict-batch request
+VIDEO_BATCH_SIZE = max(1, env_int("VIDEO_BATCH_SIZE", 8))
+MAX_BATCH_IMAGES = max(1, env_int("MAX_BATCH_IMAGES", 32))
+# ✅ sampled frames in one (non-streaming) /predict-video response; longer videos
+# come back truncated with next_t, or run as a paged job (?paged=true) uncapped
+MAX_VIDEO_FRAMES = max(1, env_int("MAX_VIDEO_FRAMES", 300))
+
+# ✅ upload size limits (MB): larger requests get 413 before the body is read
+MAX_UPLOAD_BYTES = mb_env("MAX_UPLOAD_MB", 2048)
+MAX_IMAGE_UPLOAD_BYTES = mb_env("MAX_IMAGE_UPLOAD_MB", 50)
+app.add_middleware(
+    UploadLimitMiddleware,
+    max_bytes=MAX_UPLOAD_BYTES,
+    path_limits={"/predict": MAX_IMAGE_UPLOAD_BYTES, "/predict-batch": MAX_IMAGE_UPLOAD_BYTES * MAX_BATCH_IMAGES},
+)
+
+# ✅ added last so CORS wraps everything, including early 413s
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# ✅ default ?mask_format: png | png_lowres | rle | polygon | none
+MASK_FORMAT = os.getenv("MASK_FORMAT", "png")
+if MASK_FORMAT not in MASK_FORMATS:
+    MASK_FORMAT = "png"
+MaskFormat = Literal[MASK_FORMATS]
+
+# ✅ ?keyframes=true: full video masks only every KEYFRAME_INTERVAL sampled frames
+# or when the IoU with the last full mask drops below KEYFRAME_IOU
+KEYFRAME_INTERVAL = max(1, env_int("KEYFRAME_INTERVAL", 30))
+KEYFRAME_IOU = env_float("KEYFRAME_IOU", 0.95)
+
+# Adaptive sampling: mean shoreline shift (fraction of image height) that counts as a change
+SHORELINE_CHANGE = env_float("SHORELINE_CHANGE", 0.02)
+
+# Finished /predict-video results keyed by upload + model hash + settings
+result_cache = ResultCache(
+    cache_dir=os.getenv("RESULT_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache")),
+    max_bytes=env_int("RESULT_CACHE_MAX_MB", 512) * 1024 * 1024,
+)
+
+# ✅ paged video runs: frames written to disk page by page (GET /predict-video/runs/{run_id})
+pages = PageStore(os.getenv("VIDEO_PAGES_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "pages")))
+active_runs = {}  # run_id -> Job working on it in this process
+runs_lock = threading.Lock()
+
 
 # ✅ IMPORTANT: show real validation errors instead of vague "error parsing body"
 @app.exception_handler(RequestValidationError)
@@ -88,7 +155,9 @@ def _load():
         return
 
     try:
-        model = ShorelineModel(settings)
+        t0 = time.perf_counter()
+        model = ShorelineModel(settings, metrics=metrics)
+        metrics.model_loaded("shoreline", time.perf_counter() - t0)
         model_loaded = True
         print("[startup] ✅ Model loaded")
     except Exception as e:
@@ -129,72 +198,161 @@ def compute_risk(points: list[dict], img_h: int) -> tuple[str, list[str]]:
 # After adding mask_png_b64, your Prediction schema must include it,
 # OR remove response_model to avoid FastAPI validation errors.
 @app.post("/predict")
-async def predict(file: UploadFile = File(...)):
+def predict(file: UploadFile = File(...), mask_format: MaskFormat = Query(MASK_FORMAT)):
     print("[/predict] got file:", file.filename, file.content_type)
 
     if not model_loaded or model is None:
         raise HTTPException(status_code=503, detail="Model not loaded. Check MODEL_PATH.")
 
-    content = await file.read()
-    if not content:
-        raise HTTPException(status_code=400, detail="Empty file received.")
-
-    img_array = np.frombuffer(content, np.uint8)
-    bgr = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
+    with metrics.stage("decode"):
+        bgr = read_image_upload(file)
     if bgr is None:
         raise HTTPException(status_code=400, detail="Invalid image.")
 
     try:
-        # ✅ UPDATED: model now returns (points, conf, mask_png_b64)
-        shoreline_points, shoreline_conf, mask_png_b64 = model.predict(bgr)
+        # ✅ UPDATED: model now returns (points, conf, mask encoded per mask_format)
+        prediction = model.predict(bgr, mask_format)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Inference failed: {str(e)}")
 
-    risk_level, notes = compute_risk(shoreline_points, bgr.shape[0])
+    return image_response(bgr, prediction, mask_format)
+
+
+def mask_fields(mask_format: str, mask) -> dict:
+    """
+    Response fields for an encoded mask. mask_png_b64 is always present
+    ("" unless the format is a PNG); rle / polygon get their own field.
+    """
+    out = {"mask_format": mask_format,
+           "mask_png_b64": mask if mask_format in ("png", "png_lowres") else ""}
+    if mask_format == "rle":
+        out["mask_rle"] = mask or None
+    elif mask_format == "polygon":
+        out["mask_polygon"] = mask or []
+    return out
+
+
+def image_response(bgr: np.ndarray, prediction: tuple, mask_format: str = "png") -> dict:
+    """/predict body for one image and its (points, conf, mask)."""
+    shoreline_points, shoreline_conf, mask = prediction
+    with metrics.stage("risk"):
+        risk_level, notes = compute_risk(shoreline_points, bgr.shape[0])
+    metrics.frames(kind="image")
 
     return {
         "shoreline_points": shoreline_points,
         "shoreline_conf": float(shoreline_conf),
         "risk_level": risk_level,
         "notes": notes,
-        # ✅ NEW: base64 PNG mask for Colab-like overlay
-        "mask_png_b64": mask_png_b64,
+        # ✅ NEW: mask for Colab-like overlay (base64 PNG by default)
+        **mask_fields(mask_format, mask),
         # ✅ helpful to frontend if needed
         "image": {"w": int(bgr.shape[1]), "h": int(bgr.shape[0])},
     }
 
 
-@app.post("/predict-video")
-async def predict_video(file: UploadFile = File(...)):
+@app.post("/predict-batch")
+def predict_batch(files: List[UploadFile] = File(...), mask_format: MaskFormat = Query(MASK_FORMAT)):
     """
-    Upload an mp4 (or similar) and get shoreline points + mask over time.
-    Returns frames=[{t, shoreline_points, shoreline_conf, mask_png_b64, risk_level, notes, image{w,h}}]
-
-    Sampling defaults:
-      - process about 2 frames per second (fps//2)
-      - max 300 sampled frames (safety)
+    ✅ Several images in one request -> {"results": [<same body as /predict>, ...]} in upload order.
+    Images share forward passes of up to VIDEO_BATCH_SIZE images.
     """
-    print("[/predict-video] got file:", file.filename, file.content_type)
+    print("[/predict-batch] got files:", len(files))
 
     if not model_loaded or model is None:
         raise HTTPException(status_code=503, detail="Model not loaded. Check MODEL_PATH.")
+    if len(files) > MAX_BATCH_IMAGES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_IMAGES} images per request.")
+
+    images = []
+    for i, file in enumerate(files):
+        try:
+            with metrics.stage("decode"):
+                bgr = read_image_upload(file)
+        except HTTPException as e:
+            raise HTTPException(status_code=e.status_code, detail=f"{e.detail} (#{i}: {file.filename})")
+        if bgr is None:
+            raise HTTPException(status_code=400, detail=f"Invalid image (#{i}: {file.filename}).")
+        images.append(bgr)
+
+    results = []
+    for batch in batched(images, VIDEO_BATCH_SIZE):
+        try:
+            preds = model.predict_batch(batch, mask_format)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Inference failed: {str(e)}")
+        results += [image_response(bgr, pred, mask_format) for bgr, pred in zip(batch, preds)]
+    return {"results": results}
+
+
+def batched(iterable, n: int):
+    """Lists of up to n consecutive items (pulls only as many items as each list needs)."""
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, n))
+        if not chunk:
+            return
+        yield chunk
+
+
+def read_image_upload(file: UploadFile):
+    """
+    ✅ Stream an uploaded image to disk in chunks (never the whole body in memory)
+    and decode it from there. None when it is not a readable image.
+    """
+    tmp_path, _, _ = spool_upload(file, MAX_IMAGE_UPLOAD_BYTES)
+    try:
+        return cv2.imread(tmp_path, cv2.IMREAD_COLOR)
+    finally:
+        os.remove(tmp_path)
 
-    content = await file.read()
-    if not content:
-        raise HTTPException(status_code=400, detail="Empty file received.")
 
+def save_video_upload(file: UploadFile):
+    """
+    Save an uploaded video to a temp file (cv2.VideoCapture works best with paths).
+    Returns (tmp_path, sha256 of the upload).
+    """
     # Choose suffix by content type / filename (helps VideoCapture sometimes)
     suffix = ".mp4"
     if file.filename and "." in file.filename:
         suffix = "." + file.filename.split(".")[-1].lower()
 
-    tmp_path = None
-    try:
-        # Save to temp file because cv2.VideoCapture works best with file paths
-        with NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            tmp.write(content)
-            tmp_path = tmp.name
+    tmp_path, _, upload_sha = spool_upload(file, MAX_UPLOAD_BYTES, suffix=suffix)
+    return tmp_path, upload_sha
+
 
+def shoreline_shift(prev_points: list[dict], points: list[dict], img_h: int) -> float:
+    """Mean vertical shoreline movement between two frames, as a fraction of image height."""
+    if not prev_points and not points:
+        return 0.0
+    if not prev_points or not points:
+        return 1.0  # shoreline appeared / disappeared
+    px = np.array([p["x"] for p in prev_points], dtype=np.float32)
+    py = np.array([p["y"] for p in prev_points], dtype=np.float32)
+    x = np.array([p["x"] for p in points], dtype=np.float32)
+    y = np.array([p["y"] for p in points], dtype=np.float32)
+    return float(np.mean(np.abs(np.interp(x, px, py) - y))) / max(1, img_h)
+
+
+def iter_predict_video(tmp_path: str, progress=None, idle_fps: float = None, mask_format: str = "png",
+                       keyframes: dict = None, start_t: float = None, end_t: float = None,
+                       resume_from: int = None, cleanup: bool = True):
+    """
+    Shoreline points + mask over time for a saved video; removes tmp_path when done (with `cleanup`).
+    Yields ("meta", {fps, total_frames, sample_every, ...}) once, then ("frame", {...}) per sampled frame.
+    Only [start_t, end_t) seconds are analyzed when given; `resume_from`
+    continues at that frame index (on the sampling grid) instead.
+    `progress(fraction)` is called after every sampled frame when given.
+    With `idle_fps` sampling is adaptive: ~idle_fps while the shoreline is
+    steady, back to sample_every once it moves or the risk level changes.
+    The coarse gap before a change is backfilled at sample_every too, so
+    changes are densified on both sides. Every frame carries the stride /
+    rate it was sampled at.
+    Masks are encoded per `mask_format` (png | png_lowres | rle | polygon | none).
+    With `keyframes` ({interval, min_iou, delta}) only keyframes carry a full
+    mask; the frames in between reference it (see MaskKeyframes).
+    """
+    try:
         cap = cv2.VideoCapture(tmp_path)
         if not cap.isOpened():
             raise HTTPException(status_code=400, detail="Invalid video or unsupported codec.")
@@ -205,65 +363,397 @@ async def predict_video(file: UploadFile = File(...)):
         # process ~2 frames per second
         sample_every = max(1, int(fps // 2))
 
-        frames_out = []
-        idx = 0
-
-        while True:
-            ok, frame = cap.read()
-            if not ok:
-                break
+        # ✅ adaptive: coarse while nothing changes, back to sample_every on change
+        scheduler = AdaptiveStride(sample_every, idle_stride(fps, sample_every, idle_fps)) if idle_fps else None
 
-            if idx % sample_every == 0:
-                img_h, img_w = frame.shape[:2]
+        # ✅ optional time window, in frames
+        start_frame = int(round(start_t * fps)) if start_t else 0
+        end_frame = int(round(end_t * fps)) if end_t is not None else None
+        span = (end_frame or total_frames) - start_frame
 
-                try:
-                    # ✅ UPDATED: model returns mask for overlay
-                    shoreline_points, shoreline_conf, mask_png_b64 = model.predict(frame)
-                    risk_level, notes = compute_risk(shoreline_points, img_h)
-                except Exception as e:
-                    shoreline_points, shoreline_conf, mask_png_b64 = [], 0.0, ""
-                    risk_level, notes = "medium", [f"Inference error at frame {idx}: {str(e)}"]
-
-                t = idx / float(fps if fps > 0 else 25.0)
-
-                frames_out.append(
-                    {
-                        "t": float(t),
-                        "shoreline_points": shoreline_points,  # PIXELS (polyline)
-                        "shoreline_conf": float(shoreline_conf),
-                        # ✅ NEW: mask overlay (base64 PNG)
-                        "mask_png_b64": mask_png_b64,
-                        "risk_level": risk_level,
-                        "notes": notes,
-                        "image": {"w": int(img_w), "h": int(img_h)},
-                        "frame_index": int(idx),
-                    }
-                )
-
-                # Safety cap so huge videos don't overload response
-                if len(frames_out) >= 300:
-                    break
-
-            idx += 1
-
-        cap.release()
-
-        return {
-            "mode": "video",
-            "video": {
-                "filename": file.filename,
-                "content_type": file.content_type,
-            },
+        yield "meta", {
             "fps": float(fps),
             "total_frames": int(total_frames),
             "sample_every": int(sample_every),
-            "frames": frames_out,
+            "idle_every": scheduler.idle_step if scheduler else None,
+            "start_frame": start_frame,
+            "end_frame": end_frame,
         }
 
+        prev_points, prev_risk, prev_idx = None, None, None
+        sampler = FrameSampler(cap, sample_every, start_frame if resume_from is None else resume_from, end_frame)
+        # ✅ frames go through the model VIDEO_BATCH_SIZE at a time; adaptive
+        # sampling needs each result before choosing the next stride
+        batch_size = 1 if scheduler else VIDEO_BATCH_SIZE
+        keyframer = MaskKeyframes(lambda m, w, h: model.encode_mask(m, w, h, mask_format),
+                                  **keyframes) if keyframes else None
+        backfill_cap = None
+
+        def predict(batch):
+            try:
+                # ✅ UPDATED: one forward pass per batch, mask for overlay per frame
+                # keyframe mode encodes masks itself, only for the frames that need one
+                return model.predict_batch([frame for _, frame in batch],
+                                           "none" if keyframer else mask_format, return_mask=True)
+            except Exception as e:
+                return [e] * len(batch)
+
+        def frame_payload(idx, frame, pred, frame_step):
+            img_h, img_w = frame.shape[:2]
+            try:
+                if isinstance(pred, Exception):
+                    raise pred
+                shoreline_points, shoreline_conf, mask, mask_bin = pred
+                key_fields = {}
+                if keyframer:
+                    mask, key_fields = keyframer.update(int(idx), mask_bin, img_w, img_h)
+                with metrics.stage("risk"):
+                    risk_level, notes = compute_risk(shoreline_points, img_h)
+            except Exception as e:
+                shoreline_points, shoreline_conf, mask, key_fields = [], 0.0, "", {}
+                risk_level, notes = "medium", [f"Inference error at frame {idx}: {str(e)}"]
+
+            t = idx / float(fps if fps > 0 else 25.0)
+            metrics.frames(kind="video")
+            return {
+                "t": float(t),
+                "shoreline_points": shoreline_points,  # PIXELS (polyline)
+                "shoreline_conf": float(shoreline_conf),
+                # ✅ NEW: mask overlay (base64 PNG by default)
+                **mask_fields(mask_format, mask),
+                # ✅ keyframe mode: mask_keyframe / mask_ref / mask_iou / mask_xor
+                **key_fields,
+                "risk_level": risk_level,
+                "notes": notes,
+                "image": {"w": int(img_w), "h": int(img_h)},
+                "frame_index": int(idx),
+                # ✅ effective sampling at this frame
+                "sample_every": int(frame_step),
+                "sample_fps": round(float(fps) / frame_step, 3),
+            }
+
+        def backfill(lo, hi):
+            # ✅ frames on the sample_every grid strictly between two coarse samples
+            nonlocal backfill_cap
+            if backfill_cap is None:
+                backfill_cap = cv2.VideoCapture(tmp_path)
+            gap = FrameSampler(backfill_cap, sample_every, lo + sample_every, hi)
+            for batch in batched(metrics.timed_iter(gap, "decode"), VIDEO_BATCH_SIZE):
+                for (idx, frame), pred in zip(batch, predict(batch)):
+                    yield frame_payload(idx, frame, pred, sample_every)
+
+        try:
+            frames = metrics.timed_iter(sampler, "decode")
+            for batch in batched(frames, batch_size):
+                for (idx, frame), pred in zip(batch, predict(batch)):
+                    img_h = frame.shape[0]
+                    frame_step = sampler.step
+
+                    if scheduler:
+                        if isinstance(pred, Exception):
+                            points, risk = [], "medium"
+                        else:
+                            points, risk = pred[0], compute_risk(pred[0], img_h)[0]
+                        changed = (
+                            prev_points is None
+                            or risk != prev_risk
+                            or shoreline_shift(prev_points, points, img_h) > SHORELINE_CHANGE
+                        )
+                        if changed and prev_idx is not None and idx - prev_idx > sample_every:
+                            # The change happened somewhere in the coarse gap: densify it too
+                            for payload in backfill(prev_idx, idx):
+                                yield "frame", payload
+                            frame_step = sample_every
+                        sampler.step = scheduler.update(changed)
+                        prev_points, prev_risk, prev_idx = points, risk, idx
+
+                    yield "frame", frame_payload(idx, frame, pred, frame_step)
+
+                    if progress and span > 0:
+                        progress((idx - start_frame) / span)
+        finally:
+            cap.release()
+            if backfill_cap is not None:
+                backfill_cap.release()
+
     finally:
         # cleanup temp file
         try:
-            if tmp_path and os.path.exists(tmp_path):
+            if cleanup and tmp_path and os.path.exists(tmp_path):
                 os.remove(tmp_path)
         except Exception:
             pass
+
+
+def video_cache_key(upload_sha: str, idle_fps: float = None, mask_format: str = "png",
+                    keyframes: dict = None, start_t: float = None, end_t: float = None,
+                    paged: bool = False) -> str:
+    # Everything that changes the output besides the video itself
+    params = {"conf": settings.conf, "img_size": settings.img_size, "sampling": "fps//2",
+              "max_frames": None if paged else MAX_VIDEO_FRAMES, "window": [start_t, end_t],
+              "backend": [INFERENCE_BACKEND, INFERENCE_INT8], "mask_format": mask_format,
+              "keyframes": keyframes,
+              "adaptive": [idle_fps, SHORELINE_CHANGE] if idle_fps else None}
+    return ResultCache.key(upload_sha, [settings.model_path], params)
+
+
+def run_predict_video(tmp_path: str, filename: str = None, content_type: str = None, progress=None,
+                      upload_sha: str = None, idle_fps: float = None, mask_format: str = "png",
+                      keyframes: dict = None, start_t: float = None, end_t: float = None):
+    """
+    Collect iter_predict_video() into the classic /predict-video response.
+    Stops after MAX_VIDEO_FRAMES sampled frames with truncated=true and
+    next_t, the start_t to ask for next.
+    With `upload_sha` the result is served from / stored in the result cache.
+    """
+    cache_key = video_cache_key(upload_sha, idle_fps, mask_format, keyframes, start_t, end_t) if upload_sha else None
+    if cache_key:
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            os.remove(tmp_path)
+            cached["video"] = {"filename": filename, "content_type": content_type}
+            return cached
+
+    response = {
+        "mode": "video",
+        "video": {
+            "filename": filename,
+            "content_type": content_type,
+        },
+    }
+    frames_out = []
+    response.update(truncated=False, next_t=None)
+    events = iter_predict_video(tmp_path, progress, idle_fps, mask_format, keyframes, start_t, end_t)
+    for event, payload in events:
+        if event == "meta":
+            response.update(payload)
+        elif len(frames_out) >= MAX_VIDEO_FRAMES:
+            response.update(truncated=True, next_t=payload["t"])
+            break
+        else:
+            frames_out.append(payload)
+    events.close()
+    response["frames"] = frames_out
+    if cache_key:
+        result_cache.put(cache_key, response)
+    return response
+
+
+def run_active(run_id: str) -> bool:
+    job = active_runs.get(run_id)
+    return job is not None and not job.finished
+
+
+def run_summary(run_id: str, run) -> dict:
+    """Manifest of a paged run as sent to clients (no frames)."""
+    status = run.status
+    if status in ("pending", "running") and not run_active(run_id):
+        status = "interrupted"  # the process working on it went away; POST .../resume
+    m = run.manifest
+    return {"run_id": run_id, "status": status, "pages": m["pages"], "frames_total": m["frames"],
+            "error": m["error"], "video": m.get("source"), **(m["meta"] or {})}
+
+
+def run_paged_video(run_id: str, progress=None):
+    """
+    ✅ Paged /predict-video: frames go to disk PAGE_SIZE at a time instead of into
+    one response, so memory stays bounded however long the video is.
+    An interrupted run continues after its last written page (adaptive sampling
+    and keyframes start over from there). Returns the run summary.
+    """
+    run = pages.open(run_id)
+    if run.status == "done":
+        return run_summary(run_id, run)
+
+    p = run.manifest["params"]
+    video_path = run.manifest["video_path"]
+    try:
+        for event, payload in iter_predict_video(video_path, progress, p["idle_fps"], p["mask_format"], p["keyframes"],
+                                                 p["start_t"], p["end_t"], resume_from=run.resume_from, cleanup=False):
+            if event == "meta":
+                run.start(payload)
+            else:
+                run.add(payload, payload["frame_index"] + payload["sample_every"])
+    except JobCancelled:
+        run.fail("cancelled")
+        raise
+    except Exception as e:
+        run.fail("failed", str(e))
+        raise
+
+    run.finish()
+    os.remove(video_path)
+    return run_summary(run_id, run)
+
+
+def submit_paged_run(run_id: str) -> dict:
+    """Queue run_paged_video for a run unless this process is already on it."""
+    with runs_lock:
+        job = active_runs.get(run_id)
+        if job is None or job.finished:
+            try:
+                job = jobs.submit("predict-video-pages", run_paged_video, run_id)
+            except JobQueueFull:
+                raise HTTPException(status_code=429, detail="Too many jobs in flight, retry later")
+            active_runs[run_id] = job
+    return {**job.to_dict(), "run_id": run_id}
+
+
+def start_paged_run(tmp_path: str, upload_sha: str, filename: str, content_type: str, params: dict) -> dict:
+    """
+    Paged run for an upload + settings. The same video with the same settings
+    maps to the same run, so re-uploading resumes (or re-serves) it.
+    """
+    run_id = video_cache_key(upload_sha, params["idle_fps"], params["mask_format"], params["keyframes"],
+                             params["start_t"], params["end_t"], paged=True)
+    with runs_lock:
+        pages.evict(keep={rid for rid in active_runs if run_active(rid)})
+        run = pages.open(run_id)
+        video_path = run.manifest.get("video_path")
+        if run.status == "done" or (video_path and os.path.exists(video_path)):
+            os.remove(tmp_path)
+        else:
+            # Keep the video with the run until it is done, for resuming
+            video_path = os.path.join(run.dir, "video" + os.path.splitext(tmp_path)[1])
+            shutil.move(tmp_path, video_path)
+            run.save(video_path=video_path, params=params,
+                     source={"filename": filename, "content_type": content_type})
+    return submit_paged_run(run_id)
+
+
+def check_window(start_t: Optional[float], end_t: Optional[float]):
+    if start_t is not None and end_t is not None and end_t <= start_t:
+        raise HTTPException(status_code=400, detail="end_t must be greater than start_t.")
+
+
+def keyframe_options(enabled: bool, min_iou: float, delta: str):
+    """MaskKeyframes settings for a request, None when keyframe mode is off."""
+    if not enabled:
+        return None
+    return {"interval": KEYFRAME_INTERVAL, "min_iou": min_iou, "delta": delta}
+
+
+@app.post("/predict-video")
+def predict_video(
+    file: UploadFile = File(...),
+    stream: Optional[Literal["ndjson", "sse"]] = Query(None),
+    adaptive: bool = Query(False),
+    idle_fps: float = Query(ADAPTIVE_IDLE_FPS, gt=0),
+    mask_format: MaskFormat = Query(MASK_FORMAT),
+    keyframes: bool = Query(False),
+    keyframe_iou: float = Query(KEYFRAME_IOU, ge=0, le=1),
+    mask_delta: Literal["ref", "xor"] = Query("ref"),
+    start_t: Optional[float] = Query(None, ge=0),
+    end_t: Optional[float] = Query(None, gt=0),
+):
+    """
+    Upload an mp4 (or similar) and get shoreline points + mask over time.
+    Returns frames=[{t, shoreline_points, shoreline_conf, mask_png_b64, risk_level, notes, image{w,h}}]
+    With ?stream=ndjson|sse each frame is sent as soon as it is computed.
+
+    Sampling defaults:
+      - process about 2 frames per second (fps//2)
+      - ?start_t=&end_t=: only that window of the video (seconds)
+      - max MAX_VIDEO_FRAMES (300) sampled frames per response, then truncated=true and
+        next_t (pass it as start_t to continue); streaming responses and paged jobs
+        (POST /jobs/predict-video?paged=true) have no cap
+      - ?adaptive=true: ~idle_fps while the shoreline is steady, fps//2 on change
+        (including the coarse gap before it)
+      - ?mask_format=png (full-size PNG) | png_lowres (model-size PNG) | rle | polygon | none
+      - ?keyframes=true: full masks only at keyframes (every KEYFRAME_INTERVAL frames or
+        IoU < keyframe_iou); other frames carry mask_ref, plus mask_xor with ?mask_delta=xor
+    Repeat uploads of the same clip are answered from the result cache
+    (non-streaming responses only).
+    """
+    print("[/predict-video] got file:", file.filename, file.content_type)
+
+    if not model_loaded or model is None:
+        raise HTTPException(status_code=503, detail="Model not loaded. Check MODEL_PATH.")
+    check_window(start_t, end_t)
+
+    tmp_path, upload_sha = save_video_upload(file)
+    idle_fps = idle_fps if adaptive else None
+    keyframe_opts = keyframe_options(keyframes, keyframe_iou, mask_delta)
+    if stream:
+        return stream_events(iter_predict_video(tmp_path, idle_fps=idle_fps, mask_format=mask_format,
+                                                keyframes=keyframe_opts, start_t=start_t, end_t=end_t), stream)
+    return run_predict_video(tmp_path, file.filename, file.content_type, upload_sha=upload_sha, idle_fps=idle_fps,
+                             mask_format=mask_format, keyframes=keyframe_opts, start_t=start_t, end_t=end_t)
+
+
+@app.post("/jobs/predict-video")
+def submit_predict_video_job(
+    file: UploadFile = File(...),
+    adaptive: bool = Query(False),
+    idle_fps: float = Query(ADAPTIVE_IDLE_FPS, gt=0),
+    mask_format: MaskFormat = Query(MASK_FORMAT),
+    keyframes: bool = Query(False),
+    keyframe_iou: float = Query(KEYFRAME_IOU, ge=0, le=1),
+    mask_delta: Literal["ref", "xor"] = Query("ref"),
+    start_t: Optional[float] = Query(None, ge=0),
+    end_t: Optional[float] = Query(None, gt=0),
+    paged: bool = Query(False),
+):
+    """
+    Queue a /predict-video run; poll GET /jobs/{job_id} and fetch GET /jobs/{job_id}/result.
+    ✅ ?paged=true: no frame cap; frames are written to disk in pages and read with
+    GET /predict-video/runs/{run_id}?cursor=0 (run_id is in the response) while the job runs.
+    """
+    print("[/jobs/predict-video] got file:", file.filename, file.content_type)
+
+    if not model_loaded or model is None:
+        raise HTTPException(status_code=503, detail="Model not loaded. Check MODEL_PATH.")
+    check_window(start_t, end_t)
+
+    tmp_path, upload_sha = save_video_upload(file)
+    idle_fps = idle_fps if adaptive else None
+    keyframe_opts = keyframe_options(keyframes, keyframe_iou, mask_delta)
+    if paged:
+        return start_paged_run(tmp_path, upload_sha, file.filename, file.content_type,
+                               {"idle_fps": idle_fps, "mask_format": mask_format, "keyframes": keyframe_opts,
+                                "start_t": start_t, "end_t": end_t})
+    return submit_or_429(jobs, "predict-video", run_predict_video, tmp_path, file.filename, file.content_type,
+                         upload_sha=upload_sha, idle_fps=idle_fps, mask_format=mask_format,
+                         keyframes=keyframe_opts, start_t=start_t, end_t=end_t)
+
+
+@app.get("/predict-video/runs/{run_id}")
+def get_video_run_page(run_id: str, cursor: int = Query(0, ge=0)):
+    """
+    ✅ One page of a paged run: {run_id, status, meta..., cursor, frames, next_cursor}.
+    Pages can be read as soon as they are written; follow next_cursor until it is null.
+    202 while the page at `cursor` is still being computed.
+    """
+    run = pages.get(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+
+    summary = run_summary(run_id, run)
+    frames = run.page(cursor)
+    if frames is None:
+        if run_active(run_id):
+            return JSONResponse(status_code=202, content=summary)
+        if summary["status"] == "done":
+            raise HTTPException(status_code=404, detail="cursor is past the last page")
+        raise HTTPException(status_code=409, detail=f"Run {summary['status']}; POST /predict-video/runs/{run_id}/resume")
+
+    last = summary["status"] == "done" and cursor + 1 >= summary["pages"]
+    return {**summary, "cursor": cursor, "frames": frames, "next_cursor": None if last else cursor + 1}
+
+
+@app.post("/predict-video/runs/{run_id}/resume")
+def resume_video_run(run_id: str):
+    """✅ Continue an interrupted / failed / cancelled paged run from its last written page."""
+    if not model_loaded or model is None:
+        raise HTTPException(status_code=503, detail="Model not loaded. Check MODEL_PATH.")
+    run = pages.get(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    if run.status != "done" and not os.path.exists(run.manifest.get("video_path") or ""):
+        raise HTTPException(status_code=410, detail="Video for this run is gone; upload it again")
+    return submit_paged_run(run_id)
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    return result_cache.stats()
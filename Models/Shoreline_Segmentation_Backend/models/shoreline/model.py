@@ -1,10 +1,33 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from dataclasses import dataclass
-from ultralytics import YOLO
+from common.backends import load_yolo
 import numpy as np
 import cv2
 import base64  # ✅ NEW
 
 
+# ✅ threads for per-frame mask post-processing in predict_batch
+POSTPROCESS_WORKERS = int(os.getenv("POSTPROCESS_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _postprocess_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=max(1, POSTPROCESS_WORKERS), thread_name_prefix="shoreline-post")
+        return _pool
+
+
+# ✅ how the mask is returned: full-size PNG, model-size PNG, RLE, contour polygons, or not at all
+MASK_FORMATS = ("png", "png_lowres", "rle", "polygon", "none")
+
+
 @dataclass
 class Settings:
     model_path: str
@@ -41,7 +64,88 @@ def mask_to_base64_png(mask_bin: np.ndarray) -> str:
     return base64.b64encode(buf.tobytes()).decode("utf-8")
 
 
-def mask_to_shoreline_polyline(mask: np.ndarray, max_points: int = 180) -> list[tuple[float, float]]:
+def mask_to_rle(mask_bin: np.ndarray) -> dict:
+    """
+    ✅ Run-length encoding of a binary mask, row-major.
+    counts alternate 0-runs and 1-runs, starting with a (possibly empty) 0-run.
+    """
+    flat = mask_bin.ravel() > 0
+    if flat.size == 0:
+        return {"size": list(mask_bin.shape[:2]), "counts": []}
+    bounds = np.concatenate(([0], np.flatnonzero(flat[1:] != flat[:-1]) + 1, [flat.size]))
+    counts = np.diff(bounds).tolist()
+    if flat[0]:
+        counts.insert(0, 0)
+    return {"size": [int(mask_bin.shape[0]), int(mask_bin.shape[1])], "counts": counts}
+
+
+def mask_to_polygons(mask_bin: np.ndarray, out_size: tuple[int, int] = None,
+                     epsilon: float = 1.0) -> list[list[list[float]]]:
+    """
+    ✅ Outer contours of a binary mask as polygons [[[x, y], ...], ...],
+    simplified by `epsilon` px and scaled to out_size (W_out, H_out) when given.
+    """
+    contours, _ = cv2.findContours(mask_bin.astype(np.uint8), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    H, W = mask_bin.shape[:2]
+    sx, sy = (out_size[0] / W, out_size[1] / H) if out_size else (1.0, 1.0)
+    polygons = []
+    for c in contours:
+        c = cv2.approxPolyDP(c, epsilon, True).reshape(-1, 2).astype(np.float32)
+        if len(c) < 3:
+            continue
+        c[:, 0] *= sx
+        c[:, 1] *= sy
+        polygons.append(np.round(c, 1).tolist())
+    return polygons
+
+
+def mask_iou(a: np.ndarray, b: np.ndarray) -> float:
+    """IoU of two binary masks; None stands for an empty mask (two empties match)."""
+    if a is None or b is None:
+        return 1.0 if a is None and b is None else 0.0
+    if a.shape != b.shape:
+        return 0.0
+    union = np.count_nonzero(a | b)
+    return 1.0 if union == 0 else np.count_nonzero(a & b) / union
+
+
+class MaskKeyframes:
+    """
+    ✅ Keyframe / delta encoding of the masks of one video.
+
+    A frame gets a full mask (encoded by `encode(mask_bin, w, h)`) when it is
+    the first, when `interval` frames have passed since the last keyframe, or
+    when its IoU with the keyframe mask drops below `min_iou`. Other frames
+    only reference the keyframe (`delta="ref"`) or also carry the XOR of the
+    two model-size masks as RLE (`delta="xor"`, mask = keyframe ^ xor).
+    """
+
+    def __init__(self, encode, interval: int = 30, min_iou: float = 0.95, delta: str = "ref"):
+        self.encode = encode
+        self.interval = max(1, int(interval))
+        self.min_iou = min_iou
+        self.delta = delta
+        self.key_mask = None
+        self.key_index = None
+        self.since_key = 0
+
+    def update(self, frame_index: int, mask_bin, img_w: int, img_h: int):
+        """-> (encoded mask or "" for delta frames, keyframe fields for the response)"""
+        iou = mask_iou(self.key_mask, mask_bin) if self.key_index is not None else 0.0
+        if self.key_index is None or self.since_key >= self.interval or iou < self.min_iou:
+            self.key_mask, self.key_index, self.since_key = mask_bin, frame_index, 1
+            mask = self.encode(mask_bin, img_w, img_h) if mask_bin is not None else ""
+            return mask, {"mask_keyframe": True, "mask_ref": None}
+
+        self.since_key += 1
+        fields = {"mask_keyframe": False, "mask_ref": self.key_index, "mask_iou": round(float(iou), 4)}
+        if self.delta == "xor" and mask_bin is not None:
+            fields["mask_xor"] = mask_to_rle(self.key_mask ^ mask_bin)
+        return "", fields
+
+
+def mask_to_shoreline_polyline(mask: np.ndarray, max_points: int = 180,
+                               out_size: tuple[int, int] = None) -> list[tuple[float, float]]:
     """
     Convert a THICK shoreline band mask into a SINGLE shoreline polyline.
 
@@ -49,21 +153,29 @@ def mask_to_shoreline_polyline(mask: np.ndarray, max_points: int = 180) -> list[
     because that's the risky side towards nests.
 
     mask: (H, W) binary {0,1}
+    out_size: (W_out, H_out) when `mask` is a lower-resolution version of the
+      image (e.g. the model-size mask); points are scaled to that size as if
+      the mask had been nearest-resized to it first
     returns: [(x_px, y_px), ...] sorted by x
     """
     H, W = mask.shape[:2]
-    if mask.sum() == 0:
+    if not mask.any():
         return []
 
     xs = np.linspace(0, W - 1, num=min(max_points, W), dtype=np.int32)
-    pts: list[tuple[float, float]] = []
 
-    for x in xs:
-        ys = np.where(mask[:, x] > 0)[0]
-        if ys.size == 0:
-            continue
-        y = float(np.max(ys))  # ✅ landward (bottom-most) edge
-        pts.append((float(x), y))
+    # ✅ one pass: bottom-most nonzero row of every sampled column
+    cols = mask[:, xs] > 0
+    has = cols.any(axis=0)
+    ys = H - 1 - np.argmax(cols[::-1], axis=0)
+    xs, ys = xs[has].astype(np.float32), ys[has].astype(np.float32)
+
+    if out_size is not None and (out_size[0] != W or out_size[1] != H):
+        sx, sy = out_size[0] / W, out_size[1] / H
+        xs = np.minimum((xs + 0.5) * sx - 0.5, out_size[0] - 1)  # column centre
+        ys = np.ceil((ys + 1) * sy) - 1                         # last output row of the source row
+
+    pts: list[tuple[float, float]] = list(zip(xs.tolist(), ys.tolist()))
 
     if len(pts) < 15:
         return []
@@ -88,37 +200,91 @@ def mask_to_shoreline_polyline(mask: np.ndarray, max_points: int = 180) -> list[
 
 
 class ShorelineModel:
-    def __init__(self, settings: Settings):
+    def __init__(self, settings: Settings, metrics=None):
         self.settings = settings
-        self.model = YOLO(settings.model_path)
+        # optional common.metrics.ServiceMetrics: forward / mask_<format> / polyline timings
+        self.metrics = metrics
+        # Served on INFERENCE_BACKEND (pytorch | onnx | openvino), exported at this img_size
+        self.model = load_yolo(settings.model_path, imgsz=settings.img_size, task="segment")
+        # YOLO predictors are not thread-safe; requests and jobs share this instance
+        self._lock = threading.Lock()
 
-    def predict(self, bgr_img: np.ndarray):
+    def _stage(self, name: str):
+        return self.metrics.stage(name) if self.metrics else nullcontext()
+
+    def predict(self, bgr_img: np.ndarray, mask_format: str = "png"):
         """
         YOLOv8-seg prediction.
 
         Returns:
           shoreline_points: [{x,y,conf}, ...] in PIXELS (polyline)
           shoreline_conf: float
-          mask_png_b64: str (base64 PNG of segmentation mask, resized to original image size)
+          mask: the segmentation mask encoded per `mask_format` (see encode_mask);
+            for "png" a base64 PNG resized to the original image size
         """
-        img_h, img_w = bgr_img.shape[:2]
+        return self.predict_batch([bgr_img], mask_format)[0]
 
-        results = self.model.predict(
-            source=bgr_img,
-            conf=self.settings.conf,
-            imgsz=self.settings.img_size,
-            device=self.settings.device,
-            verbose=False,
-        )
-        r0 = results[0]
+    def predict_batch(self, bgr_imgs: list[np.ndarray], mask_format: str = "png",
+                      return_mask: bool = False) -> list[tuple]:
+        """
+        ✅ One YOLOv8-seg forward pass over several images (e.g. sampled video frames).
+        Returns one (shoreline_points, shoreline_conf, mask) per image, in order;
+        with `return_mask` each tuple also carries the binary model-size mask
+        (None when nothing was segmented).
+        Mask post-processing runs on a small thread pool (OpenCV releases the GIL).
+        """
+        if not bgr_imgs:
+            return []
+
+        with self._lock, self._stage("forward"):
+            results = self.model.predict(
+                source=list(bgr_imgs),
+                conf=self.settings.conf,
+                imgsz=self.settings.img_size,
+                device=self.settings.device,
+                verbose=False,
+            )
+
+        jobs = list(zip(results, bgr_imgs))
+        if len(jobs) == 1:
+            out = [self._postprocess(*jobs[0], mask_format)]
+        else:
+            out = list(_postprocess_pool().map(lambda job: self._postprocess(*job, mask_format), jobs))
+        return out if return_mask else [o[:3] for o in out]
+
+    def encode_mask(self, mask_bin: np.ndarray, img_w: int, img_h: int, mask_format: str = "png"):
+        """
+        Encode a model-size binary mask:
+          png        -> base64 PNG at the original image size (nearest upsample)
+          png_lowres -> base64 PNG at model size (stretch it over the image)
+          rle        -> {"size": [h, w], "counts": [...]} at model size
+          polygon    -> outer contours in original-image pixels
+          none       -> ""
+        """
+        if mask_format == "none":
+            return ""
+        with self._stage(f"mask_{mask_format}"):
+            if mask_format == "rle":
+                return mask_to_rle(mask_bin)
+            if mask_format == "polygon":
+                return mask_to_polygons(mask_bin, out_size=(img_w, img_h))
+            # masks are sometimes at model-size; resize to ORIGINAL image size
+            if mask_format == "png" and (mask_bin.shape[0] != img_h or mask_bin.shape[1] != img_w):
+                mask_bin = cv2.resize(mask_bin, (img_w, img_h), interpolation=cv2.INTER_NEAREST)
+            # ✅ Option A output: base64 PNG of mask (for Colab-like overlay)
+            return mask_to_base64_png(mask_bin)
+
+    def _postprocess(self, r0, bgr_img: np.ndarray, mask_format: str = "png"):
+        img_h, img_w = bgr_img.shape[:2]
+        empty = [] if mask_format == "polygon" else ""
 
         # ✅ segmentation masks live here
         if getattr(r0, "masks", None) is None or r0.masks is None:
-            return [], 0.0, ""
+            return [], 0.0, empty, None
 
         masks = r0.masks.data  # tensor (n, h, w)
         if masks is None or len(masks) == 0:
-            return [], 0.0, ""
+            return [], 0.0, empty, None
 
         # choose best detection by box confidence
         det_idx = 0
@@ -133,15 +299,13 @@ class ShorelineModel:
         mask = masks[det_idx].cpu().numpy()  # (h, w) float 0..1
         mask_bin = (mask > 0.5).astype(np.uint8)
 
-        # masks are sometimes at model-size; resize to ORIGINAL image size
-        if mask_bin.shape[0] != img_h or mask_bin.shape[1] != img_w:
-            mask_bin = cv2.resize(mask_bin, (img_w, img_h), interpolation=cv2.INTER_NEAREST)
+        # ✅ Keep polyline output too (optional for map); extracted on the
+        # model-size mask and scaled, no full-size mask needed
+        with self._stage("polyline"):
+            pts = mask_to_shoreline_polyline(mask_bin, max_points=180, out_size=(img_w, img_h))
 
-        # ✅ Option A output: base64 PNG of mask (for Colab-like overlay)
-        mask_png_b64 = mask_to_base64_png(mask_bin)
+        mask_out = self.encode_mask(mask_bin, img_w, img_h, mask_format)
 
-        # ✅ Keep polyline output too (optional for map)
-        pts = mask_to_shoreline_polyline(mask_bin, max_points=180)
         shoreline_points = [{"x": float(x), "y": float(y), "conf": None} for (x, y) in pts]
 
-        return shoreline_points, shoreline_conf, mask_png_b64
+        return shoreline_points, shoreline_conf, mask_out, mask_bin
@@ -1,6 +1,8 @@
 from pydantic import BaseModel
 from typing import List, Optional, Literal
 
+MaskFormat = Literal["png", "png_lowres", "rle", "polygon", "none"]
+
 
 class Point(BaseModel):
     x: float
@@ -13,6 +15,12 @@ class ImageInfo(BaseModel):
     h: int
 
 
+class MaskRLE(BaseModel):
+    # row-major runs at model resolution, starting with a 0-run
+    size: List[int]  # [h, w]
+    counts: List[int]
+
+
 class Prediction(BaseModel):
     shoreline_points: List[Point]
     shoreline_conf: float
@@ -23,6 +31,11 @@ class Prediction(BaseModel):
     # base64 PNG string (NO "data:image..." prefix)
     mask_png_b64: str = ""
 
+    # ✅ ?mask_format: which of the mask fields is filled
+    mask_format: MaskFormat = "png"
+    mask_rle: Optional[MaskRLE] = None
+    mask_polygon: Optional[List[List[List[float]]]] = None  # [[[x, y], ...], ...] in pixels
+
     # ✅ helpful metadata for frontend (video/image scaling)
     image: Optional[ImageInfo] = None
 
@@ -34,12 +47,26 @@ class VideoFrame(BaseModel):
     risk_level: Literal["low", "medium", "high"]
     notes: List[str] = []
 
-    # ✅ per-frame mask (base64 PNG)
+    # ✅ per-frame mask (base64 PNG, or per mask_format)
     mask_png_b64: str = ""
+    mask_format: MaskFormat = "png"
+    mask_rle: Optional[MaskRLE] = None
+    mask_polygon: Optional[List[List[List[float]]]] = None
+
+    # ✅ ?keyframes=true: only keyframes carry a mask; other frames point at
+    # the keyframe's frame_index (mask_ref) and may carry keyframe XOR frame (mask_xor)
+    mask_keyframe: Optional[bool] = None
+    mask_ref: Optional[int] = None
+    mask_iou: Optional[float] = None
+    mask_xor: Optional[MaskRLE] = None
 
     image: ImageInfo
     frame_index: Optional[int] = None
 
+    # ✅ effective sampling at this frame (varies with adaptive sampling)
+    sample_every: Optional[int] = None
+    sample_fps: Optional[float] = None
+
 
 class VideoInfo(BaseModel):
     filename: Optional[str] = None
@@ -52,7 +79,33 @@ class VideoPrediction(BaseModel):
     fps: float
     total_frames: int
     sample_every: int
+    idle_every: Optional[int] = None
+    # ✅ ?start_t / ?end_t window in frames
+    start_frame: int = 0
+    end_frame: Optional[int] = None
+    frames: List[VideoFrame]
+    # ✅ more than MAX_VIDEO_FRAMES sampled frames: continue with ?start_t=next_t
+    truncated: bool = False
+    next_t: Optional[float] = None
+
+
+class VideoRunPage(BaseModel):
+    """✅ GET /predict-video/runs/{run_id}?cursor=N"""
+    run_id: str
+    status: Literal["pending", "running", "done", "failed", "cancelled", "interrupted"]
+    pages: int
+    frames_total: int
+    error: Optional[str] = None
+    video: Optional[VideoInfo] = None
+    fps: float
+    total_frames: int
+    sample_every: int
+    idle_every: Optional[int] = None
+    start_frame: int = 0
+    end_frame: Optional[int] = None
+    cursor: int
     frames: List[VideoFrame]
+    next_cursor: Optional[int] = None
 
 
 class Health(BaseModel):
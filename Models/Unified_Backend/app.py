@@ -1,19 +1,38 @@
 import os
+import sys
 import shutil
 import uuid
 import math
-from typing import List, Dict, Any
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from typing import List, Dict, Any, Optional, Literal
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from ultralytics import YOLO
 import cv2
 import cv2
 import numpy as np
-import requests
 import json
 
+# Shared helpers live in Models/common
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.video import FrameSampler, stride_for, idle_stride, ADAPTIVE_IDLE_FPS
+from common.jobs import JobManager, job_router, submit_or_429
+from common.streaming import stream_events
+from common.tracker import Tracker, NestDwellRule
+from common.cache import ResultCache, copy_hashed
+from common.backends import INFERENCE_BACKEND, INFERENCE_INT8
+from common.motion import MotionGate, MOTION_THRESHOLD
+from common.metrics import metrics_router
+from common.media import ranged_file_response
+from common.columnar import encode_response
+from common.roi import ROI, roi_spec
+from forwarder import DetectionForwarder
+from detection import (
+    CONF, METRICS, NMS_IOU, NMS_CLASS_IOU, NMS_CROSS_CLASS_IOU,
+    analysis_columns, detect_adaptive, detect_frames, make_registry,
+)
+from segments import SegmentPool
+
 app = FastAPI()
 
 app.add_middleware(
@@ -33,12 +52,32 @@ os.makedirs(OUTPUT_DIR, exist_ok=True)
 # Node.js Backend URL for Detections
 NODE_BACKEND_URL = "http://localhost:5002/api/detections"
 
+# Detections are posted in bulk from a background thread; undeliverable ones are spooled here
+forwarder = DetectionForwarder(
+    bulk_url=f"{NODE_BACKEND_URL}/bulk",
+    spool_dir=os.path.join(BASE_DIR, "spool"),
+    metrics=METRICS,
+)
+
+# Finished /analyze results keyed by upload + model hashes + parameters
+result_cache = ResultCache(
+    cache_dir=os.getenv("RESULT_CACHE_DIR", os.path.join(BASE_DIR, "cache")),
+    max_bytes=int(os.getenv("RESULT_CACHE_MAX_MB", "512")) * 1024 * 1024,
+)
+
+# Number of sampled frames sent to each model per forward pass
+BATCH_SIZE = int(os.getenv("ANALYZE_BATCH_SIZE", "8"))
+
 # Sources for models - ADJUST PATHS TO RELATIVE LOCATION IN THE WORKSPACE
 SOURCE_TURTLE = os.path.abspath(os.path.join(BASE_DIR, "../Nest_Detection_Backend/models/best.pt"))
 SOURCE_PREDATOR = os.path.abspath(os.path.join(BASE_DIR, "../Predator_Detection_Backend/models/best.pt"))
 SOURCE_HUMAN = os.path.abspath(os.path.join(BASE_DIR, "../Human_Detection_Backend/models/yolov8n.pt"))
 
-models = {}
+# Warm model instances; preloaded at startup, hot-swappable via /models/{key}/reload
+registry = make_registry(MODELS_DIR)
+
+# Worker processes for /analyze?parallel=true (each loads its own models)
+segment_pool = SegmentPool(MODELS_DIR)
 
 def ensure_models():
     # Copy models if not present
@@ -58,20 +97,6 @@ def ensure_models():
         print(f"Copying human model from {SOURCE_HUMAN}")
         shutil.copy(SOURCE_HUMAN, dest_human)
 
-def get_model(key):
-    if key not in models:
-        path = os.path.join(MODELS_DIR, f"{key}.pt")
-        if os.path.exists(path):
-            try:
-                print(f"Loading {key} model...")
-                models[key] = YOLO(path)
-            except Exception as e:
-                print(f"Error loading {key}: {e}")
-                return None
-        else:
-            return None
-    return models[key]
-
 # Initialize
 try:
     ensure_models()
@@ -79,18 +104,121 @@ except Exception as e:
     print(f"Setup error: {e}")
 
 
-@app.post("/analyze")
-async def analyze_video(file: UploadFile = File(...)):
-    ensure_models()
-    
+# Nest logic: a turtle track that stays within NEST_MOVEMENT_LIMIT map units
+# of where it started for NEST_TIME_THRESHOLD seconds is reported as a nest
+NEST_TIME_THRESHOLD = 3600.0 # seconds
+NEST_MOVEMENT_LIMIT = 10.0 # pixels/units on map (0-100 scale)
+TRACK_MATCH_DISTANCE = 12.0 # map units between samples
+TRACK_MAX_AGE = 2.0 # seconds a track survives unseen
+
+
+jobs = JobManager()
+app.include_router(job_router(jobs))
+
+# GET /metrics: stage timings, frames, queue depths, model load times
+METRICS.track_queue("jobs", jobs.pending)
+METRICS.track_queue("forwarder", forwarder.queue.qsize)
+METRICS.track_model_loads(lambda: {key: e.load_seconds for key, e in registry.entries.items()})
+app.include_router(metrics_router())
+
+
+def save_upload(file: UploadFile):
+    """Store an uploaded video under OUTPUT_DIR -> (file name, sha256 of its bytes)."""
     video_id = uuid.uuid4().hex
     # Use standard naming
     video_filename = f"{video_id}.mp4"
     video_path = os.path.join(OUTPUT_DIR, video_filename)
     
     with open(video_path, "wb") as f:
-        shutil.copyfileobj(file.file, f)
-        
+        _, upload_sha = copy_hashed(file.file, f)
+    return video_filename, upload_sha
+
+
+def content_url(video_filename):
+    return f"http://localhost:8000/content/{video_filename}"
+
+
+def resolve_roi(camera=None, roi=None):
+    """ROI spec for a request: inline JSON `roi` wins over the `camera` entry in ROI_CONFIG."""
+    if roi:
+        try:
+            spec = json.loads(roi)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid roi: {e}")
+        if isinstance(spec, list):
+            spec = {"polygon": spec}
+    elif camera:
+        spec = roi_spec(camera)
+        if spec is None:
+            raise HTTPException(status_code=400, detail=f"No ROI configured for camera '{camera}'")
+    else:
+        return None
+
+    # Parse it the way the run will, so a bad spec is a 400 now rather than a failure mid-run
+    try:
+        if not isinstance(spec, dict):
+            raise ValueError("expected {\"polygon\": [[x, y], ...]}, {\"margin\": px} or a point list")
+        if "margin" in spec:
+            if not isinstance(spec["margin"], (int, float)):
+                raise ValueError("margin must be a number of pixels")
+        else:
+            points = spec["polygon"]
+            if not all(isinstance(p, list) and len(p) == 2 and all(isinstance(v, (int, float)) for v in p)
+                       for p in points):
+                raise ValueError("polygon points must be [x, y] pairs of numbers")
+            if len(points) < 3:
+                raise ValueError("a polygon needs at least 3 points")
+        region = ROI.from_spec(spec, 1000, 1000)
+        if region.tile is not None and region.tile <= 0:
+            raise ValueError("tile must be a positive number of pixels")
+        if not 0 <= region.tile_overlap < 1:
+            raise ValueError("tile_overlap must be in [0, 1)")
+    except (ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid roi: {e}")
+    return spec
+
+
+def analysis_cache_key(upload_sha, step, sample_fps, motion_threshold=None, idle_fps=None, roi=None,
+                       parallel=False):
+    # Everything that changes the output besides the video itself
+    params = {
+        "step": step,
+        # segments restart motion gating / adaptive sampling at their boundaries
+        "parallel": bool(parallel),
+        "sample_fps": sample_fps,
+        "idle_fps": idle_fps,
+        "roi": roi,
+        "motion_threshold": MOTION_THRESHOLD if motion_threshold is None else motion_threshold,
+        "conf": CONF,
+        "backend": [INFERENCE_BACKEND, INFERENCE_INT8],
+        "nms": [NMS_IOU, NMS_CLASS_IOU, NMS_CROSS_CLASS_IOU],
+        "nest": [NEST_TIME_THRESHOLD, NEST_MOVEMENT_LIMIT, TRACK_MATCH_DISTANCE, TRACK_MAX_AGE],
+    }
+    model_paths = [e.path for e in registry.entries.values()]
+    return ResultCache.key(upload_sha, model_paths, params)
+
+
+def iter_analysis(video_filename, batch_size=BATCH_SIZE, step=5, sample_fps=None, progress=None, parallel=False,
+                  motion_threshold=None, idle_fps=None, roi=None):
+    """
+    Detect, track and geo-tag entities in a stored video, one sampled frame at a time.
+    Yields ("meta", {...}) once, then ("frame", {"time", "entities"}) per sampled frame,
+    then ("summary", {...}) with how many frames ran the models vs. were motion-gated.
+    `progress(fraction)` is called for every sampled frame when given.
+    With `parallel` the detection stage runs on video segments in worker
+    processes; tracking and the nest rule still run here over the merged,
+    time-ordered stream so tracks carry across segment boundaries. Each
+    segment starts its own motion gate and adaptive sampling, so frames near
+    the boundaries can differ from a sequential run.
+    With a `motion_threshold` (fraction of changed pixels; MOTION_THRESHOLD,
+    off by default), frames with no change since the last inferred one reuse
+    its detections.
+    With `idle_fps` sampling is activity-adaptive: ~idle_fps while nothing is
+    detected, the full stride around detections. Every frame carries the
+    stride / rate it was sampled at.
+    A `roi` spec (see common.roi) limits the models to a region of the frame.
+    """
+    video_path = os.path.join(OUTPUT_DIR, video_filename)
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
         raise HTTPException(status_code=400, detail="Cannot read video")
@@ -100,135 +228,53 @@ async def analyze_video(file: UploadFile = File(...)):
     height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
     total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     
-    results = []
-    
-    # Track stationary objects for nest detection
-    # Format: { 'id': [x, y, first_seen_time, last_seen_time, count] }
-    STATIONARY_THRESHOLD = 2.0 # seconds to be considered a nest
-    MOVEMENT_THRESHOLD = 5.0 # percentage of map movement allowed
-    
-    # Temporal Tracking for Nest Detection
-    # Format: { track_id: { 'first_time': t, 'last_pos': (x,y), 'type': 'turtle', 'is_nest': False } }
-    turtle_tracks = [] 
-    NEST_TIME_THRESHOLD = 3600.0 # seconds
-    NEST_MOVEMENT_LIMIT = 10.0 # pixels/units on map (0-100 scale)
-    step = 5
-
-    count = 0
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-            
-        if count % step == 0:
-            timestamp = count / fps
-            frame_dets = []
-            
-            # 1. Turtle Detection
-            model_t = get_model('turtle')
-            if model_t:
-                res = model_t(frame, verbose=False, conf=0.5)
-                for r in res:
-                    for box in r.boxes:
-                        x1, y1, x2, y2 = box.xyxy[0].tolist()
-                        cx, by = (x1 + x2) / 2, y2
-                        mx, my = (cx / width) * 100, (by / height) * 100
-                        frame_dets.append({
-                            "type": "turtle",
-                            "score": float(box.conf[0]),
-                            "bbox": [x1, y1, x2, y2],
-                            "map_x": mx,
-                            "map_y": my
-                        })
-
-            # 2. Predator Detection
-            model_p = get_model('predator')
-            if model_p:
-                res = model_p(frame, verbose=False, conf=0.5)
-                for r in res:
-                    for box in r.boxes:
-                        x1, y1, x2, y2 = box.xyxy[0].tolist()
-                        cx, by = (x1 + x2) / 2, y2
-                        frame_dets.append({
-                            "type": "predator",
-                            "score": float(box.conf[0]),
-                            "bbox": [x1, y1, x2, y2],
-                            "map_x": (cx / width) * 100,
-                            "map_y": (by / height) * 100
-                        })
-
-            # 3. Human Detection
-            model_h = get_model('human')
-            if model_h:
-                res = model_h(frame, verbose=False, conf=0.5, classes=[0])
-                for r in res:
-                    for box in r.boxes:
-                        x1, y1, x2, y2 = box.xyxy[0].tolist()
-                        cx, by = (x1 + x2) / 2, y2
-                        frame_dets.append({
-                            "type": "human",
-                            "score": float(box.conf[0]),
-                            "bbox": [x1, y1, x2, y2],
-                            "map_x": (cx / width) * 100,
-                            "map_y": (by / height) * 100
-                        })
-            
-            # Non-Maximum Suppression (NMS)
-            def calculate_iou(box1, box2):
-                x1, y1, x2, y2 = max(box1[0], box2[0]), max(box1[1], box2[1]), min(box1[2], box2[2]), min(box1[3], box2[3])
-                inter = max(0, x2 - x1) * max(0, y2 - y1)
-                area1, area2 = (box1[2]-box1[0])*(box1[3]-box1[1]), (box2[2]-box2[0])*(box2[3]-box2[1])
-                union = area1 + area2 - inter
-                return inter / union if union > 0 else 0
-
-            final_dets = []
-            frame_dets.sort(key=lambda x: x['score'], reverse=True)
-            for det in frame_dets:
-                if not any(calculate_iou(det['bbox'], other['bbox']) > 0.5 for other in final_dets):
-                    final_dets.append(det)
+    # Temporal Tracking for Nest Detection (turtle positions on the 0-100 map)
+    turtle_tracker = Tracker(max_distance=TRACK_MATCH_DISTANCE, max_age=TRACK_MAX_AGE)
+    nest_rule = NestDwellRule(NEST_TIME_THRESHOLD, NEST_MOVEMENT_LIMIT)
+    step = stride_for(fps, step, sample_fps)
+    idle_step = idle_stride(fps, step, idle_fps) if idle_fps else None
+    frame_roi = ROI.from_spec(roi, width, height)
+
+    yield "meta", {
+        "video_url": content_url(video_filename),
+        "duration": total_frames / fps,
+        "sample_step": step,
+        "idle_step": idle_step,
+        "roi_bounds": frame_roi.bounds if frame_roi else None,
+    }
+
+    if parallel and total_frames > 0:
+        detections = segment_pool.iter_detections(video_path, total_frames, step, batch_size, motion_threshold,
+                                                  idle_step, roi)
+    else:
+        gate = MotionGate(motion_threshold)
+        if idle_step:
+            detections = detect_adaptive(registry, video_path, cap, width, height, batch_size, step, idle_step, gate,
+                                         roi=frame_roi)
+        else:
+            detections = ((frame_idx, dets, inferred, step) for frame_idx, dets, inferred
+                          in detect_frames(registry, FrameSampler(cap, step), width, height, batch_size, gate,
+                                           frame_roi))
+
+    inferred_frames = gated_frames = 0
+    try:
+        for frame_idx, final_dets, inferred, frame_step in detections:
+            if inferred:
+                inferred_frames += 1
+            else:
+                gated_frames += 1
+            METRICS.frames(kind="inferred" if inferred else "gated")
+            timestamp = frame_idx / fps
+            if progress and total_frames > 0:
+                progress(frame_idx / total_frames)
 
             # --- Nest Logic: Track Turtles Over Time ---
-            current_turtles = [d for d in final_dets if d['type'] == 'turtle']
-            for t_det in current_turtles:
-                matched = False
-                for track in turtle_tracks:
-                    # Check distance from last known position
-                    dist = math.sqrt((t_det['map_x'] - track['last_pos'][0])**2 + (t_det['map_y'] - track['last_pos'][1])**2)
-                    if dist < 12.0: # Match if within 12 units
-                        track['last_pos'] = (t_det['map_x'], t_det['map_y'])
-                        track['last_seen'] = timestamp
-                        # Check if stationary for > 1 second (as per user's latest change)
-                        duration = track['last_seen'] - track['first_seen']
-                        move_from_start = math.sqrt((t_det['map_x'] - track['start_pos'][0])**2 + (t_det['map_y'] - track['start_pos'][1])**2)
-                        
-                        if duration >= NEST_TIME_THRESHOLD and move_from_start <= NEST_MOVEMENT_LIMIT:
-                            track['is_nest'] = True
-                        elif move_from_start > NEST_MOVEMENT_LIMIT:
-                            # If it moves too much, it's just a turtle again for THIS track
-                            track['is_nest'] = False
-                        
-                        if track['is_nest']:
-                            t_det['type'] = 'nest'
-                            t_det['hasNest'] = True
-                        else:
-                            t_det['type'] = 'turtle'
-                            t_det['hasNest'] = False
-                        
-                        matched = True
-                        break
-                
-                if not matched:
-                    # Start new track
-                    turtle_tracks.append({
-                        'start_pos': (t_det['map_x'], t_det['map_y']),
-                        'last_pos': (t_det['map_x'], t_det['map_y']),
-                        'first_seen': timestamp,
-                        'last_seen': timestamp,
-                        'is_nest': False
-                    })
-
-            # Cleanup old tracks (not seen for 2 seconds)
-            turtle_tracks = [t for t in turtle_tracks if timestamp - t['last_seen'] < 2.0]
+            with METRICS.stage("tracking"):
+                current_turtles = [d for d in final_dets if d['type'] == 'turtle']
+                rows = turtle_tracker.update(timestamp, points=[(d['map_x'], d['map_y']) for d in current_turtles])
+                for t_det, is_nest in zip(current_turtles, nest_rule.check(turtle_tracker, rows)):
+                    t_det['type'] = 'nest' if is_nest else 'turtle'
+                    t_det['hasNest'] = bool(is_nest)
 
             # Spatial Metadata
             cam_x, cam_y = 50.0, 100.0
@@ -237,53 +283,195 @@ async def analyze_video(file: UploadFile = File(...)):
                 dist = math.sqrt(dx**2 + dy**2)
                 d['distance_m'] = round((dist / 100.0) * 15.0, 2)
                 d['bearing_deg'] = round(math.degrees(math.atan2(dx, -dy)), 1)
-                
+            
                 # --- AUTO-POST TO BACKEND ---
-                try:
-                    payload = {
-                        "type": d['type'],
-                        "confidence": d['score'],
-                        "location": {
-                            "zone": "Simulation Zone",
-                            "coordinates": {
-                                "x": d['map_x'],
-                                "y": d['map_y']
-                            }
-                        },
-                        "nestStatus": "safe", # Default
-                        "videoSource": video_filename,
-                        "details": f"Video Time: {timestamp:.2f}s, Dist: {d['distance_m']}m"
-                    }
-                    if d.get('hasNest'):
-                        payload['nestStatus'] = 'safe'
-                        payload['details'] += " (Potential Nest)"
-                    
-                    # Fire and forget
-                    requests.post(NODE_BACKEND_URL, json=payload, timeout=0.1)
-                except Exception as e:
-                    # Ignore connection errors to prevent slowing down too much or crashing
-                    pass
-
-            results.append({
+                payload = {
+                    "type": d['type'],
+                    "confidence": d['score'],
+                    "location": {
+                        "zone": "Simulation Zone",
+                        "coordinates": {
+                            "x": d['map_x'],
+                            "y": d['map_y']
+                        }
+                    },
+                    "nestStatus": "safe", # Default
+                    "videoSource": video_filename,
+                    "details": f"Video Time: {timestamp:.2f}s, Dist: {d['distance_m']}m"
+                }
+                if d.get('hasNest'):
+                    payload['nestStatus'] = 'safe'
+                    payload['details'] += " (Potential Nest)"
+
+                # Queued for the background bulk sender; never blocks analysis
+                forwarder.submit(payload)
+
+            yield "frame", {
                 "time": timestamp,
-                "entities": final_dets
-            })
-            
-        count += 1
-        
-    cap.release()
-    
-    return {
-        "video_url": f"http://localhost:8000/content/{video_filename}",
-        "duration": total_frames / fps,
-        "data": results
-    }
+                "entities": final_dets,
+                # Effective sampling around this frame (varies with ?adaptive=true)
+                "sample_step": frame_step,
+                "sample_fps": round(fps / frame_step, 3),
+            }
+
+        yield "summary", {
+            "motion_threshold": MOTION_THRESHOLD if motion_threshold is None else motion_threshold,
+            "inferred_frames": inferred_frames,
+            "gated_frames": gated_frames,
+        }
+    finally:
+        # Closing the generator cancels segments that have not started yet
+        detections.close()
+        cap.release()
+
+
+def run_analysis(video_filename, batch_size=BATCH_SIZE, step=5, sample_fps=None, progress=None, upload_sha=None,
+                 parallel=False, motion_threshold=None, idle_fps=None, roi=None):
+    """
+    Collect iter_analysis() into the classic /analyze response.
+    With `upload_sha` the result is served from / stored in the result cache
+    (parallel and sequential runs are cached separately).
+    """
+    cache_key = (analysis_cache_key(upload_sha, step, sample_fps, motion_threshold, idle_fps, roi, parallel)
+                 if upload_sha else None)
+    if cache_key:
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            cached["video_url"] = content_url(video_filename)
+            return cached
+
+    response, results = {}, []
+    for event, payload in iter_analysis(video_filename, batch_size, step, sample_fps, progress, parallel,
+                                        motion_threshold, idle_fps, roi):
+        if event == "meta":
+            response = payload
+        elif event == "summary":
+            response["motion"] = payload
+        else:
+            results.append(payload)
+    response["data"] = results
+    if cache_key:
+        result_cache.put(cache_key, response)
+    return response
+
+
+@app.post("/analyze")
+def analyze_video(
+    request: Request,
+    file: UploadFile = File(...),
+    batch_size: int = Query(BATCH_SIZE, ge=1, le=64),
+    step: int = Query(5, ge=1),
+    sample_fps: Optional[float] = Query(None, gt=0),
+    stream: Optional[Literal["ndjson", "sse"]] = Query(None),
+    parallel: bool = Query(False),
+    motion_threshold: Optional[float] = Query(None, ge=0, le=1),
+    adaptive: bool = Query(False),
+    idle_fps: float = Query(ADAPTIVE_IDLE_FPS, gt=0),
+    camera: Optional[str] = Query(None),
+    roi: Optional[str] = Query(None),
+    columnar: bool = Query(False),
+):
+    """
+    Analyze an uploaded video. With ?stream=ndjson|sse each sampled frame is
+    sent as soon as it is computed instead of in one response at the end.
+    ?parallel=true splits long videos into segments analyzed by worker processes.
+    ?motion_threshold overrides MOTION_THRESHOLD (default 0: the models run on every sampled frame).
+    ?adaptive=true samples at ~idle_fps until something is detected, then at the full stride.
+    Repeat uploads of the same clip are answered from the result cache
+    (non-streaming responses only).
+    ?columnar=true (or Accept: application/x-msgpack / application/x-npz)
+    replaces the per-frame `data` list with parallel per-entity arrays.
+    ?camera=<id> runs the models only inside that camera's ROI from ROI_CONFIG;
+    ?roi= takes the spec inline, e.g. [[0,0.4],[1,0.4],[1,1],[0,1]] (fractions of the frame).
+    """
+    region = resolve_roi(camera, roi)
+    video_filename, upload_sha = save_upload(file)
+    idle_fps = idle_fps if adaptive else None
+    if stream:
+        return stream_events(iter_analysis(video_filename, batch_size, step, sample_fps, parallel=parallel,
+                                           motion_threshold=motion_threshold, idle_fps=idle_fps, roi=region),
+                             stream)
+    result = run_analysis(video_filename, batch_size, step, sample_fps, upload_sha=upload_sha, parallel=parallel,
+                          motion_threshold=motion_threshold, idle_fps=idle_fps, roi=region)
+    return encode_response(request, result, analysis_columns, columnar=columnar)
+
+
+@app.post("/jobs/analyze")
+def submit_analyze_job(
+    file: UploadFile = File(...),
+    batch_size: int = Query(BATCH_SIZE, ge=1, le=64),
+    step: int = Query(5, ge=1),
+    sample_fps: Optional[float] = Query(None, gt=0),
+    parallel: bool = Query(False),
+    motion_threshold: Optional[float] = Query(None, ge=0, le=1),
+    adaptive: bool = Query(False),
+    idle_fps: float = Query(ADAPTIVE_IDLE_FPS, gt=0),
+    camera: Optional[str] = Query(None),
+    roi: Optional[str] = Query(None),
+):
+    """Queue an /analyze run; poll GET /jobs/{job_id} and fetch GET /jobs/{job_id}/result."""
+    region = resolve_roi(camera, roi)
+    video_filename, upload_sha = save_upload(file)
+    return submit_or_429(jobs, "analyze", run_analysis, video_filename, batch_size, step, sample_fps,
+                         upload_sha=upload_sha, parallel=parallel, motion_threshold=motion_threshold,
+                         idle_fps=idle_fps if adaptive else None, roi=region)
+
+
+@app.on_event("startup")
+def _preload_models():
+    registry.preload()
+    registry.watch()
+
+
+@app.on_event("startup")
+def _start_forwarder():
+    forwarder.start()
+
+
+@app.on_event("shutdown")
+def _stop_forwarder():
+    forwarder.close()
+
+
+@app.on_event("shutdown")
+def _stop_segment_pool():
+    segment_pool.shutdown()
+
+
+@app.get("/ready")
+def ready():
+    """200 once every model is loaded and warmed; per-model load times either way."""
+    body = {"ready": registry.ready(), "models": registry.status()}
+    return JSONResponse(status_code=200 if body["ready"] else 503, content=body)
+
+
+@app.post("/models/{key}/reload")
+def reload_model(key: str):
+    """Swap in the current model file for `key` without restarting."""
+    if key not in registry.entries:
+        raise HTTPException(status_code=404, detail="Unknown model")
+    status = registry.reload(key)
+    # Segment workers hold their own copies; restart them on next use
+    segment_pool.shutdown()
+    return status
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    return result_cache.stats()
+
+
+@app.get("/forwarder/stats")
+def forwarder_stats():
+    return forwarder.stats()
+
 
 @app.get("/content/{filename}")
-async def get_content(filename: str):
+async def get_content(filename: str, request: Request):
     path = os.path.join(OUTPUT_DIR, filename)
     if os.path.exists(path):
-        return FileResponse(path)
+        # Range / If-None-Match aware so the player can seek without re-downloading
+        return ranged_file_response(request, path)
     raise HTTPException(status_code=404)
 
 
@@ -0,0 +1,231 @@
+import os
+import sys
+
+import cv2
+import numpy as np
+
+# Shared helpers live in Models/common
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from common.backends import load_yolo
+from common.columnar import offsets
+from common.metrics import ServiceMetrics
+from common.nms import nms
+from common.preprocess import SHARED_PREPROCESS, PreparedBatch, input_signature
+from common.registry import ModelRegistry
+from common.video import FrameSampler
+
+# (model key, entity type, extra predict kwargs)
+DETECTORS = [
+    ("turtle", "turtle", {}),
+    ("predator", "predator", {}),
+    ("human", "human", {"classes": [0]}),
+]
+
+# Integer code per entity type, used for class-aware NMS
+TYPE_CODES = {det_type: code for code, (_, det_type, _) in enumerate(DETECTORS)}
+
+# Type codes in columnar responses: detector types, then the tracker's "nest" relabel
+ENTITY_TYPES = list(TYPE_CODES) + ["nest"]
+
+CONF = 0.5
+
+# Stage timings for /metrics (decode, forward, nms here; the app adds the rest)
+METRICS = ServiceMetrics("unified")
+
+# Cross-model NMS: boxes of the same type suppress each other above these IoUs.
+# Different types (e.g. a predator over a turtle) only suppress each other when
+# NMS_CROSS_CLASS_IOU is set.
+NMS_IOU = float(os.getenv("NMS_IOU", "0.5"))
+NMS_CLASS_IOU = {}  # per-type overrides, e.g. {TYPE_CODES["human"]: 0.6}
+NMS_CROSS_CLASS_IOU = float(os.environ["NMS_CROSS_CLASS_IOU"]) if os.getenv("NMS_CROSS_CLASS_IOU") else None
+
+
+def make_registry(models_dir):
+    """Registry with one entry per detector, backed by <models_dir>/<key>.pt."""
+    # load_yolo serves the .pt on INFERENCE_BACKEND (pytorch | onnx | openvino)
+    registry = ModelRegistry(loader=load_yolo)
+    for key, _, _ in DETECTORS:
+        registry.register(key, os.path.join(models_dir, f"{key}.pt"))
+    return registry
+
+
+def merge_detections(frame_dets):
+    """Class-aware NMS across the outputs of all detectors for one frame."""
+    if not frame_dets:
+        return []
+    keep = nms(
+        [d['bbox'] for d in frame_dets],
+        [d['score'] for d in frame_dets],
+        [TYPE_CODES[d['type']] for d in frame_dets],
+        iou=NMS_IOU,
+        class_iou=NMS_CLASS_IOU,
+        cross_iou=NMS_CROSS_CLASS_IOU,
+    )
+    return [frame_dets[i] for i in keep]
+
+
+def detect_batch(registry, frames, width, height, roi=None):
+    """
+    Run every detector once over a batch of frames.
+    Returns one list of detections per input frame, in input order.
+    With a common.roi.ROI the models only see its crop (or tiles); boxes come
+    back in full-frame coordinates and outside the polygon are dropped.
+    With SHARED_PREPROCESS the batch is letterboxed once per input size and
+    that tensor is fed to every detector expecting it.
+    """
+    batch_dets = [[] for _ in frames]
+    if roi is None:
+        views = [(i, 0, 0, frame) for i, frame in enumerate(frames)]
+    else:
+        views = [(i, ox, oy, img) for i, frame in enumerate(frames) for ox, oy, img in roi.views(frame)]
+    images = [img for _, _, _, img in views]
+    prepared = {}  # input signature -> PreparedBatch
+    for key, det_type, kwargs in DETECTORS:
+        model = registry.get(key)
+        if not model:
+            continue
+        sig = input_signature(model) if SHARED_PREPROCESS else None
+        if sig is not None and sig not in prepared:
+            with METRICS.stage("preprocess"):
+                prepared[sig] = PreparedBatch(images, *sig)
+        batch = prepared[sig] if sig is not None else None
+        # YOLO predictors are not thread-safe; jobs share models through this lock
+        with registry.lock(key), METRICS.stage("forward"):
+            res = model(batch.tensor if batch else images, verbose=False, conf=CONF, **kwargs)
+        for j, ((i, ox, oy, _), r) in enumerate(zip(views, res)):
+            for box in r.boxes:
+                xyxy = box.xyxy[0].tolist()
+                if batch:
+                    # Tensor inputs come back in letterboxed coordinates
+                    xyxy = batch.unscale(j, xyxy)
+                x1, y1, x2, y2 = xyxy
+                x1, y1, x2, y2 = x1 + ox, y1 + oy, x2 + ox, y2 + oy
+                cx, by = (x1 + x2) / 2, y2
+                if roi is not None and not roi.contains(cx, by):
+                    continue
+                batch_dets[i].append({
+                    "type": det_type,
+                    "score": float(box.conf[0]),
+                    "bbox": [x1, y1, x2, y2],
+                    "map_x": (cx / width) * 100,
+                    "map_y": (by / height) * 100
+                })
+    return batch_dets
+
+
+def detect_frames(registry, sampled, width, height, batch_size, gate=None, roi=None):
+    """
+    Per-frame detection stage of /analyze: batched inference + NMS.
+    `sampled` yields (frame_idx, frame); yields (frame_idx, final_dets, inferred).
+    Frames a MotionGate rejects skip the models and reuse the detections
+    of the last frame that ran (inferred=False). With `roi` only motion
+    inside its bounding box counts and the models only see the ROI.
+    """
+    def batches():
+        # Collect sampled frames into batches of `batch_size` frames that need
+        # inference; gated frames ride along as None
+        batch, pending = [], 0
+        for frame_idx, frame in METRICS.timed_iter(sampled, "decode"):
+            if gate is not None and not gate.should_run(frame if roi is None else roi.crop(frame)):
+                frame = None
+            else:
+                pending += 1
+            batch.append((frame_idx, frame))
+            if pending >= batch_size or len(batch) >= 4 * batch_size:
+                yield batch
+                batch, pending = [], 0
+        if batch:
+            yield batch
+
+    last = []
+    for batch in batches():
+        frames = [frame for _, frame in batch if frame is not None]
+        batch_dets = iter(detect_batch(registry, frames, width, height, roi) if frames else [])
+        for frame_idx, frame in batch:
+            if frame is not None:
+                # Non-Maximum Suppression (NMS)
+                with METRICS.stage("nms"):
+                    last = merge_detections(next(batch_dets))
+            # Copies: later stages annotate detections in place
+            yield frame_idx, [dict(d) for d in last], frame is not None
+
+
+def detect_adaptive(registry, video_path, cap, width, height, batch_size, active_step, idle_step, gate=None,
+                    start_frame=0, end_frame=None, is_active=bool, roi=None):
+    """
+    Activity-adaptive version of detect_frames(). A coarse pass samples every
+    `idle_step` frames; wherever a coarse sample is active (`is_active(dets)`,
+    any detection by default) the gaps to its neighbouring coarse samples are
+    filled in every `active_step` frames, so events are densified on both
+    sides. Yields (frame_idx, final_dets, inferred, step) in frame order,
+    where `step` is the stride in effect around that frame.
+    """
+    coarse = detect_frames(registry, FrameSampler(cap, idle_step, start_frame, end_frame), width, height,
+                           batch_size, gate, roi)
+    dense_cap = None
+
+    def dense(lo, hi):
+        # Frames on the active grid strictly between two coarse samples
+        nonlocal dense_cap
+        first = max(0, (lo // active_step + 1) * active_step)
+        if first >= hi:
+            return
+        if dense_cap is None:
+            dense_cap = cv2.VideoCapture(video_path)
+        sampled = FrameSampler(dense_cap, active_step, start_frame=first, end_frame=hi)
+        for frame_idx, dets, inferred in detect_frames(registry, sampled, width, height, batch_size, roi=roi):
+            yield frame_idx, dets, inferred, active_step
+
+    try:
+        # In a segment (start_frame > 0) the gap before the first sample is backfilled
+        # too; it overlaps the previous segment and SegmentPool drops the duplicates
+        prev, prev_active = None, False
+        prev_idx = start_frame - idle_step if start_frame > 0 else -1
+        for frame_idx, dets, inferred in coarse:
+            active = is_active(dets)
+            if prev is not None:
+                yield prev
+            densify = prev_active or active
+            if densify:
+                yield from dense(prev_idx, frame_idx)
+            prev = (frame_idx, dets, inferred, active_step if densify else idle_step)
+            prev_active, prev_idx = active, frame_idx
+        if prev is not None:
+            yield prev
+            if prev_active:
+                hi = prev_idx + idle_step if end_frame is None else min(end_frame, prev_idx + idle_step)
+                yield from dense(prev_idx, hi)
+    finally:
+        coarse.close()
+        if dense_cap is not None:
+            dense_cap.release()
+
+
+def analysis_columns(response):
+    """
+    Columnar form of an /analyze response: `data` (one dict per sampled frame
+    holding per-entity dicts) becomes parallel per-entity arrays plus
+    per-frame offsets (entities of frame i are rows offsets[i]:offsets[i + 1]).
+    """
+    frames = response["data"]
+    ents = [e for f in frames for e in f["entities"]]
+    codes = {t: i for i, t in enumerate(ENTITY_TYPES)}
+    times = [f["time"] for f in frames]
+    counts = [len(f["entities"]) for f in frames]
+    body = {k: v for k, v in response.items() if k != "data"}
+    body["columns"] = {
+        "frame_time": np.array(times, dtype=np.float64),
+        "frame_step": np.array([f.get("sample_step", 0) for f in frames], dtype=np.int32),
+        "offsets": offsets(counts),
+        "time": np.repeat(np.array(times, dtype=np.float64), counts),
+        "type": np.array([codes[e["type"]] for e in ents], dtype=np.int8),
+        "score": np.array([e["score"] for e in ents], dtype=np.float32),
+        "bbox": np.array([e["bbox"] for e in ents], dtype=np.float32).reshape(-1, 4),
+        "map_x": np.array([e["map_x"] for e in ents], dtype=np.float32),
+        "map_y": np.array([e["map_y"] for e in ents], dtype=np.float32),
+        "distance_m": np.array([e.get("distance_m", 0.0) for e in ents], dtype=np.float32),
+        "bearing_deg": np.array([e.get("bearing_deg", 0.0) for e in ents], dtype=np.float32),
+        "has_nest": np.array([bool(e.get("hasNest")) for e in ents], dtype=np.bool_),
+    }
+    body["type_names"] = ENTITY_TYPES
+    return body
@@ -0,0 +1,206 @@
+import glob
+import json
+import os
+import queue
+import threading
+import time
+from contextlib import nullcontext
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class DetectionForwarder:
+    """
+    Ships detection payloads to the Node backend off the analysis hot path.
+
+    submit() never blocks: payloads go into a bounded queue, and a single
+    background thread coalesces them into bulk POSTs over a keep-alive
+    session. Failed batches are retried with exponential backoff and then
+    spilled to JSONL files in `spool_dir`, which are replayed once Node
+    answers again. If the queue itself is full, payloads are spilled directly.
+    Only connection errors, 5xx and 429 are retried. Items Node reports as
+    invalid (the `failed` indexes of a 2xx reply, or the whole batch on any
+    other 4xx) are moved to a rejected-*.jsonl file and not retried.
+    """
+
+    def __init__(self, bulk_url: str, spool_dir: str, max_queue: int = 10000, max_batch: int = 200,
+                 flush_interval: float = 0.5, timeout: float = 5.0, max_retries: int = 4,
+                 backoff: float = 0.5, backoff_max: float = 10.0, replay_interval: float = 30.0, metrics=None):
+        self.bulk_url = bulk_url
+        self.spool_dir = spool_dir
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.replay_interval = replay_interval
+        self.metrics = metrics  # optional ServiceMetrics; times each POST as "node_post"
+
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+
+        self.sent = 0
+        self.spooled = 0
+        self.failed_posts = 0
+        self.rejected = 0
+        self._spool_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        os.makedirs(spool_dir, exist_ok=True)
+
+    def start(self):
+        # Batches that were mid-replay when the process died go back in the spool
+        for path in glob.glob(os.path.join(self.spool_dir, "detections-*.jsonl.replay")):
+            os.replace(path, path[:-len(".jsonl.replay")] + "-recovered.jsonl")
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="detection-forwarder", daemon=True)
+            self._thread.start()
+
+    def submit(self, payload: dict):
+        try:
+            self.queue.put_nowait(payload)
+        except queue.Full:
+            self._spill([payload])
+
+    def close(self, timeout: float = 5.0):
+        """Stop the sender; anything still queued is spilled to disk."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        leftover = self._drain(self.queue.qsize())
+        if leftover:
+            self._spill(leftover)
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.queue.qsize(),
+            "sent": self.sent,
+            "spooled": self.spooled,
+            "failed_posts": self.failed_posts,
+            "rejected": self.rejected,
+            "spool_files": len(self._spool_files()),
+        }
+
+    # ---------- sender thread ----------
+    def _run(self):
+        last_replay = 0.0
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if batch:
+                if not self._deliver(batch):
+                    continue
+            elif time.time() - last_replay < self.replay_interval:
+                continue
+            # Node is reachable (or worth probing again): flush the spool
+            last_replay = time.time()
+            self._replay_spool()
+
+    def _next_batch(self) -> list:
+        try:
+            first = self.queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.time() + self.flush_interval
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self, n: int) -> list:
+        out = []
+        for _ in range(n):
+            try:
+                out.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return out
+
+    def _post(self, batch: list) -> bool:
+        """True once Node has the batch (or rejected it for good), False when worth retrying."""
+        try:
+            with self.metrics.stage("node_post") if self.metrics else nullcontext():
+                res = self.session.post(self.bulk_url, json=batch, timeout=self.timeout)
+            if 200 <= res.status_code < 300 or (400 <= res.status_code < 500 and res.status_code != 429):
+                # Retrying will not change Node's mind about invalid items; keep them out of the spool
+                failed = self._failed_items(batch, res)
+                if failed:
+                    self._reject(failed, res)
+                self.sent += len(batch) - len(failed)
+                return True
+        except requests.RequestException:
+            pass
+        self.failed_posts += 1
+        return False
+
+    @staticmethod
+    def _failed_items(batch: list, res) -> list:
+        """Items of `batch` Node refused: the `failed` indexes of a 2xx, all of them on a 4xx."""
+        if res.status_code >= 300:
+            return batch  # nothing was stored
+        try:
+            indexes = {f["index"] for f in res.json().get("failed") or []}
+        except (ValueError, AttributeError, TypeError, KeyError):
+            return []
+        return [payload for i, payload in enumerate(batch) if i in indexes]
+
+    def _reject(self, batch: list, res):
+        path = os.path.join(self.spool_dir, f"rejected-{time.strftime('%Y%m%d-%H')}.jsonl")
+        print(f"[forwarder] Node rejected {len(batch)} detections ({res.status_code}): {res.text[:200]!r}; "
+              f"moved to {path}")
+        with self._spool_lock:
+            with open(path, "a", encoding="utf-8") as f:
+                for payload in batch:
+                    f.write(json.dumps(payload) + "\n")
+        self.rejected += len(batch)
+
+    def _deliver(self, batch: list) -> bool:
+        for attempt in range(self.max_retries):
+            if self._post(batch):
+                return True
+            if self._stop.wait(min(self.backoff_max, self.backoff * 2 ** attempt)):
+                break
+        self._spill(batch)
+        return False
+
+    # ---------- spill / replay ----------
+    def _spool_files(self) -> list:
+        return sorted(glob.glob(os.path.join(self.spool_dir, "detections-*.jsonl")))
+
+    def _spill(self, batch: list, count: bool = True):
+        path = os.path.join(self.spool_dir, f"detections-{time.strftime('%Y%m%d-%H')}.jsonl")
+        with self._spool_lock:
+            with open(path, "a", encoding="utf-8") as f:
+                for payload in batch:
+                    f.write(json.dumps(payload) + "\n")
+            if count:
+                self.spooled += len(batch)
+
+    def _replay_spool(self):
+        for path in self._spool_files():
+            replay_path = path + ".replay"
+            with self._spool_lock:
+                try:
+                    os.replace(path, replay_path)
+                except OSError:
+                    continue
+            with open(replay_path, encoding="utf-8") as f:
+                payloads = [json.loads(line) for line in f if line.strip()]
+
+            for i in range(0, len(payloads), self.max_batch):
+                if not self._post(payloads[i:i + self.max_batch]):
+                    # Node went away again; keep what is left for next time
+                    self._spill(payloads[i:], count=False)
+                    os.remove(replay_path)
+                    return
+            os.remove(replay_path)
@@ -0,0 +1,127 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from detection import detect_adaptive, detect_frames, make_registry
+from common.motion import MotionGate
+from common.roi import ROI
+from common.video import FrameSampler
+
+ANALYZE_WORKERS = int(os.getenv("ANALYZE_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+
+# Set in each worker process by _init_worker
+_registry = None
+
+
+def _init_worker(models_dir, torch_threads):
+    global _registry
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+    _registry = make_registry(models_dir)
+    _registry.preload()
+
+
+def analyze_segment(video_path, start_frame, end_frame, step, batch_size, motion_threshold=None, idle_step=None,
+                    roi_spec=None):
+    """
+    Detection stage for frames [start_frame, end_frame) -> [(frame_idx, final_dets, inferred, step), ...].
+    With `idle_step` the segment is sampled adaptively (see detect_adaptive);
+    `roi_spec` restricts the models to a region (see common.roi).
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise RuntimeError(f"Cannot read video: {video_path}")
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    try:
+        gate = MotionGate(motion_threshold)
+        roi = ROI.from_spec(roi_spec, width, height)
+        if idle_step:
+            return list(detect_adaptive(_registry, video_path, cap, width, height, batch_size, step, idle_step, gate,
+                                        start_frame=start_frame, end_frame=end_frame, roi=roi))
+        sampled = FrameSampler(cap, step, start_frame=start_frame, end_frame=end_frame)
+        return [(frame_idx, dets, inferred, step)
+                for frame_idx, dets, inferred in detect_frames(_registry, sampled, width, height, batch_size, gate,
+                                                                roi)]
+    finally:
+        cap.release()
+
+
+def split_segments(total_frames, step, n):
+    """
+    Split [0, total_frames) into up to n segments whose starts are multiples
+    of `step`, so the union samples exactly the frames a sequential pass would.
+    The last segment is open-ended because CAP_PROP_FRAME_COUNT is an estimate.
+    """
+    n_samples = -(-total_frames // step)
+    n = max(1, min(n, n_samples))
+    bounds = np.linspace(0, n_samples, n + 1).astype(int) * step
+    segments = [(int(bounds[i]), int(bounds[i + 1])) for i in range(n)]
+    segments[-1] = (segments[-1][0], None)
+    return segments
+
+
+class SegmentPool:
+    """
+    Process pool for /analyze?parallel=true. Each worker holds its own
+    decoder and model set; the pool is started on first use and reused.
+    """
+
+    def __init__(self, models_dir, workers=ANALYZE_WORKERS):
+        self.models_dir = models_dir
+        self.workers = max(1, workers)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                torch_threads = max(1, (os.cpu_count() or 1) // self.workers)
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    # spawn: forking a process that already runs threads/torch is unsafe
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.models_dir, torch_threads),
+                )
+            return self._executor
+
+    def shutdown(self):
+        """Stop the workers (e.g. after a model reload); the next request starts fresh ones."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def iter_detections(self, video_path, total_frames, step, batch_size, motion_threshold=None, idle_step=None,
+                        roi_spec=None):
+        """Yield (frame_idx, final_dets, inferred, step) in timestamp order while segments run in parallel."""
+        executor = self._get_executor()
+        # A few segments per worker keeps all cores busy when segment costs differ
+        # Adaptive runs split on the coarse grid so every segment starts on a coarse sample
+        grid = idle_step or step
+        min_frames = grid * batch_size * 4
+        n = max(1, min(self.workers * 4, total_frames // max(1, min_frames)))
+        futures = [
+            executor.submit(analyze_segment, video_path, start, end, step, batch_size, motion_threshold, idle_step,
+                            roi_spec)
+            for start, end in split_segments(total_frames, grid, n)
+        ]
+        last_idx = -1
+        try:
+            for future in futures:
+                for row in future.result():
+                    # Neighbouring segments may both densify the gap at their boundary
+                    if row[0] > last_idx:
+                        last_idx = row[0]
+                        yield row
+        finally:
+            for future in futures:
+                future.cancel()
@@ -0,0 +1,418 @@
+"""
+Offline benchmark for the inference services.
+
+Every scenario runs in its own process against the service app in-process
+(FastAPI TestClient / the Hatchery frame generator), on synthetic media and,
+by default, tiny randomly initialised stand-in models, so no network, GPU or
+trained weights are needed. Results (throughput, p50/p95/p99 latency, peak
+RSS, startup time) go to a JSON file that --compare diffs against an
+earlier run.
+
+    python Models/benchmarks/bench.py --iterations 5 --seconds 10
+    python Models/benchmarks/bench.py --scenarios analyze shoreline-video --compare results/old.json
+    python Models/benchmarks/bench.py --query analyze:parallel=true --query analyze:adaptive=true
+"""
+import argparse
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import types
+from urllib.parse import parse_qsl
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_ROOT = os.path.dirname(BENCH_DIR)
+RESULT_MARKER = "BENCH_RESULT "
+
+SCENARIOS = [
+    "analyze",           # Unified_Backend POST /analyze
+    "shoreline-predict",  # Shoreline POST /predict
+    "shoreline-video",   # Shoreline POST /predict-video
+    "classify",          # Disease_Detection POST /classify
+    "nest-detect",       # Nest POST /detect-video
+    "predator-detect",   # Predator POST /detect-video/predator
+    "human-detect",      # Human POST /detect-video
+    "hatchery-stream",   # Hatchery VideoController.generate_frames
+]
+
+
+# ---------- measurement ----------
+def peak_rss_mb():
+    try:
+        import resource
+        kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(kb / 1024 / (1024 if sys.platform == "darwin" else 1), 1)
+    except ImportError:
+        try:
+            import psutil
+            return round(psutil.Process().memory_info().peak_wset / 2 ** 20, 1)
+        except Exception:
+            return None
+
+
+def measure(call, iterations, warmup=1):
+    """Time `call()` (which returns the number of frames/images it processed)."""
+    for _ in range(warmup):
+        call()
+    latencies, items = [], 0
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        items += call()
+        latencies.append(time.perf_counter() - t0)
+    lat_ms = np.array(latencies) * 1000
+    total = float(np.sum(latencies))
+    return {
+        "iterations": iterations,
+        "items": items,
+        "items_per_s": round(items / total, 3) if total > 0 else None,
+        "requests_per_s": round(iterations / total, 3) if total > 0 else None,
+        "latency_ms": {
+            "mean": round(float(lat_ms.mean()), 2),
+            "p50": round(float(np.percentile(lat_ms, 50)), 2),
+            "p95": round(float(np.percentile(lat_ms, 95)), 2),
+            "p99": round(float(np.percentile(lat_ms, 99)), 2),
+            "min": round(float(lat_ms.min()), 2),
+            "max": round(float(lat_ms.max()), 2),
+        },
+    }
+
+
+# ---------- fixtures ----------
+def stand_in_yolo(path, cfg="yolov8n.yaml"):
+    """A randomly initialised YOLO built from an architecture yaml, saved as a .pt (offline)."""
+    if os.path.exists(path):
+        return path
+    from ultralytics import YOLO
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    YOLO(cfg).save(path)
+    return path
+
+
+def stand_in_encoder(path):
+    """Randomly initialised Conv4 encoder with the Disease service's architecture."""
+    if os.path.exists(path):
+        return path
+    sys.path.insert(0, os.path.join(MODELS_ROOT, "Disease_Detection"))
+    from inference import DiseaseClassifier
+    DiseaseClassifier.build_conv4_encoder(None).save(path)
+    return path
+
+
+def load_service(service, module, workdir=None):
+    """Import a service module the way `python <service>/<module>.py` would see it."""
+    service_dir = os.path.join(MODELS_ROOT, service)
+    sys.path.insert(0, service_dir)
+    if workdir:
+        os.makedirs(workdir, exist_ok=True)
+        os.chdir(workdir)  # services resolve models/ and outputs/ relative to cwd
+    return importlib.import_module(module)
+
+
+def upload(path, name, content_type):
+    with open(path, "rb") as f:
+        return {"file": (name, f.read(), content_type)}
+
+
+def post_counter(client, url, files, params, count):
+    def call():
+        r = client.post(url, files=files, params=params)
+        if r.status_code != 200:
+            raise RuntimeError(f"{url} -> {r.status_code}: {r.text[:300]}")
+        return count(r.json())
+    return call
+
+
+# ---------- scenarios (run in a child process) ----------
+def run_analyze(cfg, work):
+    from fastapi.testclient import TestClient
+    os.environ.setdefault("RESULT_CACHE_DIR", os.path.join(work, "cache"))
+    os.environ["RESULT_CACHE_MAX_MB"] = "0"  # every request is a miss
+    mod = load_service("Unified_Backend", "app")
+    if not cfg["real_models"]:
+        models = os.path.join(work, "unified_models")
+        for key in ("turtle", "predator", "human"):
+            stand_in_yolo(os.path.join(models, f"{key}.pt"))
+        mod.registry = mod.make_registry(models)
+        mod.segment_pool = mod.SegmentPool(models)
+    mod.OUTPUT_DIR = os.path.join(work, "outputs")
+    os.makedirs(mod.OUTPUT_DIR, exist_ok=True)
+    # Node is not running; keep undeliverable detections out of the repo
+    mod.forwarder = mod.DetectionForwarder(bulk_url=f"{mod.NODE_BACKEND_URL}/bulk",
+                                           spool_dir=os.path.join(work, "spool"))
+    t0 = time.perf_counter()
+    with TestClient(mod.app) as client:
+        startup = time.perf_counter() - t0
+        files = upload(cfg["video"], "bench.mp4", "video/mp4")
+        res = measure(post_counter(client, "/analyze", files, cfg["query"], lambda j: len(j["data"])),
+                      cfg["iterations"])
+    res["startup_s"] = round(startup, 3)
+    return res
+
+
+def _shoreline(cfg, work):
+    os.environ.setdefault("RESULT_CACHE_DIR", os.path.join(work, "cache"))
+    os.environ["RESULT_CACHE_MAX_MB"] = "0"
+    if not cfg["real_models"]:
+        os.environ["MODEL_PATH"] = stand_in_yolo(os.path.join(work, "shoreline_seg.pt"), "yolov8n-seg.yaml")
+    service_dir = os.path.join(MODELS_ROOT, "Shoreline_Segmentation_Backend")
+    return load_service("Shoreline_Segmentation_Backend", "app", workdir=service_dir)
+
+
+def run_shoreline_predict(cfg, work):
+    from fastapi.testclient import TestClient
+    mod = _shoreline(cfg, work)
+    t0 = time.perf_counter()
+    with TestClient(mod.app) as client:
+        startup = time.perf_counter() - t0
+        files = upload(cfg["image"], "bench.jpg", "image/jpeg")
+        res = measure(post_counter(client, "/predict", files, cfg["query"], lambda j: 1), cfg["iterations"])
+    res["startup_s"] = round(startup, 3)
+    return res
+
+
+def run_shoreline_video(cfg, work):
+    from fastapi.testclient import TestClient
+    mod = _shoreline(cfg, work)
+    t0 = time.perf_counter()
+    with TestClient(mod.app) as client:
+        startup = time.perf_counter() - t0
+        files = upload(cfg["video"], "bench.mp4", "video/mp4")
+        res = measure(post_counter(client, "/predict-video", files, cfg["query"], lambda j: len(j["frames"])),
+                      cfg["iterations"])
+    res["startup_s"] = round(startup, 3)
+    return res
+
+
+def run_classify(cfg, work):
+    from fastapi.testclient import TestClient
+    t0 = time.perf_counter()
+    mod = load_service("Disease_Detection", "api")
+    if not cfg["real_models"]:
+        mod.classifier = mod.DiseaseClassifier(stand_in_encoder(os.path.join(work, "encoder.keras")), None)
+    startup = time.perf_counter() - t0
+    with TestClient(mod.app) as client:
+        files = upload(cfg["image"], "bench.jpg", "image/jpeg")
+        res = measure(post_counter(client, "/classify", files, cfg["query"], lambda j: 1), cfg["iterations"])
+    res["startup_s"] = round(startup, 3)
+    return res
+
+
+def _detect_video(cfg, work, service, model_name, url, count):
+    from fastapi.testclient import TestClient
+    if cfg["real_models"]:
+        workdir = os.path.join(MODELS_ROOT, service)
+    else:
+        workdir = os.path.join(work, service)
+        stand_in_yolo(os.path.join(workdir, "models", model_name))
+    t0 = time.perf_counter()
+    mod = load_service(service, "app", workdir=workdir)
+    startup = time.perf_counter() - t0
+    with TestClient(mod.app) as client:
+        files = upload(cfg["video"], "bench.mp4", "video/mp4")
+        res = measure(post_counter(client, url, files, cfg["query"], count), cfg["iterations"])
+    res["startup_s"] = round(startup, 3)
+    return res
+
+
+def run_nest_detect(cfg, work):
+    return _detect_video(cfg, work, "Nest_Detection_Backend", "turtle.pt", "/detect-video",
+                         lambda j: j["processed_frames"])
+
+
+def run_predator_detect(cfg, work):
+    return _detect_video(cfg, work, "Predator_Detection_Backend", "predator.pt", "/detect-video/predator",
+                         lambda j: j["processed_frames"])
+
+
+def run_human_detect(cfg, work):
+    return _detect_video(cfg, work, "Human_Detection_Backend", "human.pt", "/detect-video",
+                         lambda j: j["frames_processed"])
+
+
+def run_hatchery_stream(cfg, work):
+    if not cfg["real_models"]:
+        os.environ["HATCHERY_MODEL_PATH"] = stand_in_yolo(os.path.join(work, "hatchery.pt"))
+    t0 = time.perf_counter()
+    mod = load_service("Hatchery_Detection", "ai_server")
+    startup = time.perf_counter() - t0
+    # No real-time pacing and no alert posting: measure compute only
+    # (a copy of the time module with sleep() patched; everything else untouched)
+    paced = types.ModuleType("time")
+    paced.__dict__.update(time.__dict__)
+    paced.sleep = lambda s: None
+    mod.time = paced
+    mod.VideoController._trigger_alert = lambda self, *a, **k: None
+
+    mod.engine.register_video("bench", cfg["video"])
+    frames = mod.engine.generate_frames("bench")
+    n = max(1, cfg["frames_per_iteration"])
+
+    def call():
+        for _ in range(n):
+            next(frames)
+        return n
+
+    res = measure(call, cfg["iterations"])
+    frames.close()
+    res["startup_s"] = round(startup, 3)
+    return res
+
+
+RUNNERS = {
+    "analyze": run_analyze,
+    "shoreline-predict": run_shoreline_predict,
+    "shoreline-video": run_shoreline_video,
+    "classify": run_classify,
+    "nest-detect": run_nest_detect,
+    "predator-detect": run_predator_detect,
+    "human-detect": run_human_detect,
+    "hatchery-stream": run_hatchery_stream,
+}
+
+
+def child_main(name, cfg_json):
+    cfg = json.loads(cfg_json)
+    cfg["query"] = cfg["queries"].get(name, {})
+    try:
+        result = RUNNERS[name](cfg, cfg["workdir"])
+        result["ok"] = True
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        result = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+    result["peak_rss_mb"] = peak_rss_mb()
+    sys.stdout.flush()
+    print(RESULT_MARKER + json.dumps(result), flush=True)
+
+
+# ---------- orchestration ----------
+def run_scenario(name, cfg, verbose=False):
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--run-scenario", name, "--config", json.dumps(cfg)],
+        stdout=subprocess.PIPE, stderr=None if verbose else subprocess.PIPE, text=True,
+    )
+    for line in reversed(proc.stdout.splitlines()):
+        if line.startswith(RESULT_MARKER):
+            return json.loads(line[len(RESULT_MARKER):])
+    tail = (proc.stderr or proc.stdout or "")[-2000:]
+    return {"ok": False, "error": f"exit code {proc.returncode}", "log_tail": tail}
+
+
+def compare(results, baseline_path):
+    """Print per-scenario throughput / latency changes against an earlier results file."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        base = json.load(f)["results"]
+    print(f"\nCompared with {baseline_path}:")
+    for name, cur in results.items():
+        old = base.get(name)
+        if not (cur.get("ok") and old and old.get("ok")):
+            continue
+        def pct(a, b):
+            return f"{(a - b) / b * 100:+.1f}%" if a is not None and b else "n/a"
+        print(f"  {name:18s} items/s {pct(cur['items_per_s'], old['items_per_s']):>8s}  "
+              f"p50 {pct(cur['latency_ms']['p50'], old['latency_ms']['p50']):>8s}  "
+              f"p95 {pct(cur['latency_ms']['p95'], old['latency_ms']['p95']):>8s}  "
+              f"rss {pct(cur['peak_rss_mb'], old['peak_rss_mb']):>8s}")
+
+
+def parse_queries(items):
+    queries = {}
+    for item in items or []:
+        name, _, qs = item.partition(":")
+        if name not in RUNNERS:
+            raise SystemExit(f"Unknown scenario in --query: {name}")
+        queries.setdefault(name, {}).update(dict(parse_qsl(qs)))
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline throughput / latency / memory benchmark")
+    parser.add_argument("--scenarios", nargs="*", default=SCENARIOS, choices=SCENARIOS)
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--seconds", type=float, default=10.0, help="synthetic video length")
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--static-fraction", type=float, default=0.5,
+                        help="leading share of the video with an unchanging scene")
+    parser.add_argument("--frames-per-iteration", type=int, default=30, help="hatchery-stream frames per sample")
+    parser.add_argument("--query", action="append", metavar="SCENARIO:k=v&k2=v2",
+                        help="extra query parameters for a scenario's request")
+    parser.add_argument("--real-models", action="store_true", help="use the services' own model files")
+    parser.add_argument("--workdir", default=None, help="fixtures / stand-in models (kept between runs)")
+    parser.add_argument("--out", default=None, help="results JSON (default results/bench-<time>.json)")
+    parser.add_argument("--compare", default=None, help="earlier results JSON to diff against")
+    parser.add_argument("--verbose", action="store_true", help="show service logs")
+    parser.add_argument("--run-scenario", help=argparse.SUPPRESS)
+    parser.add_argument("--config", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_scenario:
+        return child_main(args.run_scenario, args.config)
+
+    from synthetic import make_image, make_video
+
+    workdir = os.path.abspath(args.workdir or os.path.join(tempfile.gettempdir(), "franklin-bench"))
+    os.makedirs(workdir, exist_ok=True)
+    tag = f"{args.width}x{args.height}_{args.seconds:g}s_{args.fps:g}fps_{args.static_fraction:g}"
+    video = os.path.join(workdir, f"video_{tag}.mp4")
+    image = os.path.join(workdir, f"image_{args.width}x{args.height}.jpg")
+    if not os.path.exists(video):
+        make_video(video, args.seconds, args.fps, args.width, args.height, args.static_fraction)
+    if not os.path.exists(image):
+        make_image(image, args.width, args.height)
+
+    cfg = {
+        "workdir": workdir,
+        "video": video,
+        "image": image,
+        "iterations": args.iterations,
+        "frames_per_iteration": args.frames_per_iteration,
+        "real_models": args.real_models,
+        "queries": parse_queries(args.query),
+    }
+
+    results = {}
+    for name in args.scenarios:
+        print(f"[bench] {name} ...", flush=True)
+        results[name] = run_scenario(name, cfg, args.verbose)
+        r = results[name]
+        if r.get("ok"):
+            print(f"[bench] {name}: {r['items_per_s']} items/s, p50 {r['latency_ms']['p50']} ms, "
+                  f"p95 {r['latency_ms']['p95']} ms, peak RSS {r['peak_rss_mb']} MB")
+        else:
+            print(f"[bench] {name}: FAILED ({r.get('error')})")
+
+    out = args.out or os.path.join(BENCH_DIR, "results", f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "inference_backend": os.getenv("INFERENCE_BACKEND", "pytorch"),
+            "stand_in_models": not args.real_models,
+            "video": {"seconds": args.seconds, "fps": args.fps, "width": args.width, "height": args.height,
+                      "static_fraction": args.static_fraction},
+            "iterations": args.iterations,
+            "queries": cfg["queries"],
+        },
+        "results": results,
+    }
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"[bench] results written to {out}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
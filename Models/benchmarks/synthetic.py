@@ -0,0 +1,62 @@
+import cv2
+import numpy as np
+
+
+def _background(width, height, rng):
+    # Sand-coloured, slightly textured backdrop like the beach / tank cameras
+    base = np.empty((height, width, 3), dtype=np.float32)
+    base[:] = (150, 190, 210)  # BGR
+    base += rng.normal(0, 12, (height, width, 1)).astype(np.float32)
+    base = cv2.GaussianBlur(base, (0, 0), 3)
+    return np.clip(base, 0, 255).astype(np.uint8)
+
+
+def make_frame(width, height, t=0.0, n_objects=3, seed=0):
+    """One synthetic frame with `n_objects` dark blobs placed along a path parameterized by t in [0, 1]."""
+    rng = np.random.default_rng(seed)
+    frame = _background(width, height, rng)
+    r = max(8, min(width, height) // 20)
+    for k in range(n_objects):
+        phase = (t + k / max(1, n_objects)) % 1.0
+        cx = int(r + phase * (width - 2 * r))
+        cy = int(height * (0.3 + 0.5 * ((k * 0.37) % 1.0)))
+        cv2.ellipse(frame, (cx, cy), (int(r * 1.4), r), 0, 0, 360, (40, 60, 70), -1)
+    return frame
+
+
+def make_video(path, seconds=10.0, fps=30.0, width=1280, height=720, static_fraction=0.5, n_objects=3, seed=0):
+    """
+    Write a synthetic mp4: the first `static_fraction` of the clip is an
+    unchanging empty scene (exercises motion gating / adaptive sampling),
+    the rest has `n_objects` blobs moving across it.
+    Returns the number of frames written.
+    """
+    rng = np.random.default_rng(seed)
+    still = _background(width, height, rng)
+    n_frames = max(1, int(round(seconds * fps)))
+    n_static = int(n_frames * static_fraction)
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Cannot write video: {path}")
+    try:
+        for i in range(n_frames):
+            if i < n_static:
+                writer.write(still)
+            else:
+                t = (i - n_static) / max(1, n_frames - n_static)
+                writer.write(make_frame(width, height, t, n_objects, seed))
+    finally:
+        writer.release()
+    return n_frames
+
+
+def make_image(path, width=1280, height=720, n_objects=3, seed=0):
+    """Write a synthetic JPEG and return its bytes."""
+    ok, buf = cv2.imencode(".jpg", make_frame(width, height, 0.25, n_objects, seed))
+    if not ok:
+        raise RuntimeError("JPEG encoding failed")
+    data = buf.tobytes()
+    with open(path, "wb") as f:
+        f.write(data)
+    return data
@@ -0,0 +1,241 @@
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from common.nms import box_iou
+
+# pytorch (default) | onnx | openvino
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "pytorch").strip().lower()
+INFERENCE_INT8 = os.getenv("INFERENCE_INT8", "0").lower() in ("1", "true", "yes")
+INFERENCE_IMGSZ = int(os.getenv("INFERENCE_IMGSZ", "640"))
+# Calibration dataset yaml for OpenVINO INT8 (ultralytics downloads coco8 when unset)
+INFERENCE_INT8_DATA = os.getenv("INFERENCE_INT8_DATA") or None
+# Compare a fresh export against PyTorch; on mismatch the service keeps using PyTorch
+INFERENCE_PARITY_CHECK = os.getenv("INFERENCE_PARITY_CHECK", "1").lower() in ("1", "true", "yes")
+# Directory of sample frames for the parity check. Without it the check runs on
+# random noise, which detectors find nothing in: the export is then "unverified"
+INFERENCE_PARITY_IMAGES = os.getenv("INFERENCE_PARITY_IMAGES") or None
+
+BACKENDS = ("pytorch", "onnx", "openvino")
+
+_export_lock = threading.Lock()
+
+
+def exported_path(pt_path: str, backend: str, int8: bool = False) -> str:
+    """Where the export of `pt_path` for `backend` lives (next to the .pt, ultralytics naming)."""
+    stem, _ = os.path.splitext(pt_path)
+    if backend == "onnx":
+        return f"{stem}.int8.onnx" if int8 else f"{stem}.onnx"
+    if backend == "openvino":
+        return f"{stem}_int8_openvino_model" if int8 else f"{stem}_openvino_model"
+    return pt_path
+
+
+def _parity_report_path(target: str) -> str:
+    return f"{target.rstrip(os.sep)}.parity.json"
+
+
+def _is_fresh(target: str, pt_path: str) -> bool:
+    return os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(pt_path)
+
+
+def _copy_onnx_metadata(src: str, dst: str):
+    # ultralytics reads names/stride/imgsz/task from the ONNX metadata; quantization drops it
+    import onnx
+    meta = onnx.load(src).metadata_props
+    q = onnx.load(dst)
+    del q.metadata_props[:]
+    q.metadata_props.extend(meta)
+    onnx.save(q, dst)
+
+
+def export_model(pt_path: str, backend: str = INFERENCE_BACKEND, int8: bool = INFERENCE_INT8,
+                 imgsz: int = INFERENCE_IMGSZ) -> str:
+    """
+    Export `pt_path` once and return the exported path. The export is cached
+    next to the .pt and redone only when the .pt is newer than it.
+    """
+    if backend == "pytorch":
+        return pt_path
+    from ultralytics import YOLO
+
+    target = exported_path(pt_path, backend, int8)
+    with _export_lock:
+        if _is_fresh(target, pt_path):
+            return target
+
+        print(f"Exporting {pt_path} to {backend}{' (INT8)' if int8 else ''}...")
+        t0 = time.perf_counter()
+        model = YOLO(pt_path)
+        if backend == "onnx":
+            # dynamic axes so batched callers (Unified /analyze) can send several frames
+            out = model.export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+            if int8:
+                from onnxruntime.quantization import QuantType, quantize_dynamic
+                quantize_dynamic(out, target, weight_type=QuantType.QUInt8)
+                _copy_onnx_metadata(out, target)
+        elif backend == "openvino":
+            model.export(format="openvino", imgsz=imgsz, dynamic=True, int8=int8, data=INFERENCE_INT8_DATA)
+        else:
+            raise ValueError(f"Unknown inference backend: {backend}")
+        print(f"Exported {target} in {time.perf_counter() - t0:.1f}s")
+
+        if INFERENCE_PARITY_CHECK:
+            report = parity_check(pt_path, target, images=_parity_images(), imgsz=imgsz)
+            with open(_parity_report_path(target), "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            print(f"Parity {report['status'].upper()} for {target}: {report}")
+            if report["status"] == "unverified":
+                print("No detections to compare; set INFERENCE_PARITY_IMAGES to frames with objects in them")
+        return target
+
+
+def _parity_images(n: int = 8) -> list:
+    if INFERENCE_PARITY_IMAGES and os.path.isdir(INFERENCE_PARITY_IMAGES):
+        import cv2
+        names = sorted(os.listdir(INFERENCE_PARITY_IMAGES))
+        imgs = [cv2.imread(os.path.join(INFERENCE_PARITY_IMAGES, n)) for n in names]
+        imgs = [im for im in imgs if im is not None]
+        if imgs:
+            return imgs
+    rng = np.random.default_rng(0)
+    return [rng.integers(0, 256, (480, 640, 3), dtype=np.uint8) for _ in range(n)]
+
+
+def _match(a: np.ndarray, b: np.ndarray, min_iou: float = 0.5):
+    """Greedy IoU matching of box sets -> list of (i, j, iou)."""
+    if len(a) == 0 or len(b) == 0:
+        return []
+    iou = box_iou(a, b)
+    pairs = []
+    while True:
+        i, j = np.unravel_index(np.argmax(iou), iou.shape)
+        if iou[i, j] < min_iou:
+            return pairs
+        pairs.append((int(i), int(j), float(iou[i, j])))
+        iou[i, :] = -1
+        iou[:, j] = -1
+
+
+def parity_check(pt_path: str, exported: str, images=None, task: str = None, conf: float = 0.25,
+                 imgsz: int = INFERENCE_IMGSZ, min_iou: float = 0.9, max_score_diff: float = 0.05) -> dict:
+    """
+    Run the PyTorch model and its export on the same images and compare
+    detections: box counts, IoU of matched boxes and score drift, plus the
+    mean per-image latency of each.
+    `status` is "ok", "failed", or "unverified" when neither model detected
+    anything (nothing was compared; `ok` is False then too).
+    """
+    from ultralytics import YOLO
+
+    images = images if images is not None else _parity_images()
+    ref = YOLO(pt_path)
+    task = task or ref.task
+    exp = YOLO(exported, task=task)
+
+    def run(model):
+        outs, t = [], 0.0
+        for img in images:
+            t0 = time.perf_counter()
+            r = model(img, conf=conf, imgsz=imgsz, verbose=False)[0]
+            t += time.perf_counter() - t0
+            boxes = r.boxes
+            outs.append((boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy(), boxes.cls.cpu().numpy()))
+        return outs, t / max(1, len(images)) * 1000
+
+    run(exp)  # first call pays for session init
+    ref_out, ref_ms = run(ref)
+    exp_out, exp_ms = run(exp)
+
+    n_ref = n_exp = n_matched = 0
+    ious, score_diffs = [], []
+    for (rb, rs, rc), (eb, es, ec) in zip(ref_out, exp_out):
+        n_ref += len(rb)
+        n_exp += len(eb)
+        for i, j, iou in _match(rb, eb):
+            if rc[i] != ec[j]:
+                continue
+            n_matched += 1
+            ious.append(iou)
+            score_diffs.append(abs(float(rs[i]) - float(es[j])))
+
+    mean_iou = float(np.mean(ious)) if ious else 1.0
+    worst_score = float(np.max(score_diffs)) if score_diffs else 0.0
+    matches = n_matched == n_ref == n_exp and mean_iou >= min_iou and worst_score <= max_score_diff
+    status = "failed" if not matches else ("ok" if n_ref else "unverified")
+    return {
+        "images": len(images),
+        "pytorch_boxes": n_ref,
+        "exported_boxes": n_exp,
+        "matched": n_matched,
+        "mean_iou": round(mean_iou, 4),
+        "max_score_diff": round(worst_score, 4),
+        "pytorch_ms": round(ref_ms, 2),
+        "exported_ms": round(exp_ms, 2),
+        "status": status,
+        "ok": status == "ok",
+    }
+
+
+def _parity_status(target: str):
+    """"ok" | "failed" | "unverified" from the saved parity report, None without one."""
+    try:
+        with open(_parity_report_path(target), "r", encoding="utf-8") as f:
+            report = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return report.get("status", "ok" if report.get("ok", True) else "failed")
+
+
+def load_yolo(pt_path: str, backend: str = None, int8: bool = None, imgsz: int = INFERENCE_IMGSZ,
+              task: str = None):
+    """
+    Drop-in for YOLO(pt_path) that serves the model on INFERENCE_BACKEND.
+    Falls back to the PyTorch weights when the export fails or fails parity.
+    """
+    from ultralytics import YOLO
+
+    backend = (backend or INFERENCE_BACKEND).lower()
+    int8 = INFERENCE_INT8 if int8 is None else int8
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {backend} (expected one of {BACKENDS})")
+    if backend == "pytorch":
+        return YOLO(pt_path)
+
+    try:
+        target = export_model(pt_path, backend, int8, imgsz)
+    except Exception as e:
+        print(f"Export to {backend} failed for {pt_path}, using PyTorch: {e}")
+        return YOLO(pt_path)
+    parity = _parity_status(target)
+    if parity == "failed":
+        print(f"{target} failed the parity check, using PyTorch")
+        return YOLO(pt_path)
+    if parity == "unverified":
+        print(f"Warning: {target} is unverified (no detections in the parity images), serving it anyway")
+    # Exported files do not always encode the task (e.g. segmentation); take it from the .pt
+    return YOLO(target, task=task or YOLO(pt_path).task)
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    import cv2
+
+    parser = argparse.ArgumentParser(description="Export a YOLO .pt and compare it with PyTorch")
+    parser.add_argument("model")
+    parser.add_argument("--backend", default="onnx", choices=BACKENDS[1:])
+    parser.add_argument("--int8", action="store_true")
+    parser.add_argument("--imgsz", type=int, default=INFERENCE_IMGSZ)
+    parser.add_argument("--images", nargs="*", default=None)
+    args = parser.parse_args()
+
+    path = export_model(args.model, args.backend, args.int8, args.imgsz)
+    imgs = [cv2.imread(p) for p in args.images] if args.images else None
+    report = parity_check(args.model, path, images=imgs, imgsz=args.imgsz)
+    print(json.dumps(report, indent=2))
+    sys.exit({"ok": 0, "failed": 1}.get(report["status"], 2))
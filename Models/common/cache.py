@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import threading
+
+CHUNK_SIZE = 1024 * 1024
+
+_file_hashes = {}
+
+
+class SizeLimitExceeded(ValueError):
+    pass
+
+
+def copy_hashed(src, dst, max_bytes: int = None) -> tuple:
+    """
+    Copy file object src into dst while hashing it -> (bytes_written, sha256 hex).
+    Raises SizeLimitExceeded as soon as more than `max_bytes` have been read.
+    """
+    h = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = src.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        size += len(chunk)
+        if max_bytes is not None and size > max_bytes:
+            raise SizeLimitExceeded(f"upload exceeds {max_bytes} bytes")
+        h.update(chunk)
+        dst.write(chunk)
+    return size, h.hexdigest()
+
+
+def file_sha256(path: str) -> str:
+    """SHA-256 of a file on disk, memoized until its size or mtime changes."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    sig = (st.st_size, st.st_mtime)
+    cached = _file_hashes.get(path)
+    if cached and cached[0] == sig:
+        return cached[1]
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    _file_hashes[path] = (sig, h.hexdigest())
+    return _file_hashes[path][1]
+
+
+class ResultCache:
+    """
+    Size-bounded LRU of JSON results on local disk.
+
+    Keys are derived from the upload hash, the hashes of every model file
+    involved and the analysis parameters, so retraining a model or changing
+    sampling naturally misses. A hit refreshes the entry's mtime, and
+    eviction removes the least recently used files first.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(upload_sha256: str, model_paths, params: dict) -> str:
+        ident = {
+            "upload": upload_sha256,
+            "models": [file_sha256(p) for p in model_paths],
+            "params": params,
+        }
+        return hashlib.sha256(json.dumps(ident, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: dict):
+        path = self._path(key)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(value, f)
+        os.replace(tmp, path)
+        with self._lock:
+            self._evict()
+
+    def _entries(self) -> list:
+        out = []
+        for e in os.scandir(self.cache_dir):
+            if e.name.endswith(".json"):
+                st = e.stat()
+                out.append((st.st_mtime, st.st_size, e.path))
+        return out
+
+    def _evict(self):
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        entries = self._entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+        }
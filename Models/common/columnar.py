@@ -0,0 +1,122 @@
+import gzip
+import io
+import json
+import os
+
+import numpy as np
+from fastapi import HTTPException, Request
+from fastapi.responses import Response
+
+# Optional encoders; JSON falls back to the stdlib, MessagePack / brotli are refused when missing
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESS_MIN_BYTES", "1024"))
+
+MSGPACK_TYPES = ("application/x-msgpack", "application/msgpack", "application/vnd.msgpack")
+NPZ_TYPE = "application/x-npz"
+
+
+def offsets(counts) -> np.ndarray:
+    """Row offsets for per-frame counts: rows of frame i are [off[i], off[i + 1])."""
+    off = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=off[1:])
+    return off
+
+
+def detection_columns(report: dict, class_names) -> dict:
+    """
+    Columnar form of a Nest / Predator VideoReport: `detections` (one dict
+    per processed frame holding parallel boxes / scores / classes lists)
+    becomes flat per-box arrays plus per-frame offsets.
+    """
+    dets = report["detections"]
+    names = list(class_names)
+    codes = {name: i for i, name in enumerate(names)}
+    classes = [c for d in dets for c in d["classes"]]
+    for c in classes:
+        if c not in codes:
+            codes[c] = len(names)
+            names.append(c)
+    counts = [len(d["scores"]) for d in dets]
+    body = {k: v for k, v in report.items() if k != "detections"}
+    body["columns"] = {
+        "frame_idx": np.array([d["frame_idx"] for d in dets], dtype=np.int64),
+        "timestamp_s": np.array([d["timestamp_s"] for d in dets], dtype=np.float64),
+        "offsets": offsets(counts),
+        "box": np.array([b for d in dets for b in d["boxes"]], dtype=np.float32).reshape(-1, 4),
+        "score": np.array([s for d in dets for s in d["scores"]], dtype=np.float32),
+        "class": np.array([codes[c] for c in classes], dtype=np.int16),
+    }
+    body["class_names"] = names
+    return body
+
+
+def _to_builtin(columns: dict) -> dict:
+    return {k: v.tolist() if isinstance(v, np.ndarray) else v for k, v in columns.items()}
+
+
+def dumps_json(body) -> bytes:
+    """orjson when installed (numpy arrays serialized natively), else compact stdlib json."""
+    if orjson is not None:
+        return orjson.dumps(body, option=orjson.OPT_SERIALIZE_NUMPY)
+    if isinstance(body, dict) and isinstance(body.get("columns"), dict):
+        body = {**body, "columns": _to_builtin(body["columns"])}
+    return json.dumps(body, separators=(",", ":")).encode("utf-8")
+
+
+def _dumps_npz(body: dict) -> bytes:
+    # Arrays go in as-is; everything else rides along as one JSON string entry
+    meta = {k: v for k, v in body.items() if k != "columns"}
+    buf = io.BytesIO()
+    np.savez_compressed(buf, meta=np.array(json.dumps(meta)), **body["columns"])
+    return buf.getvalue()
+
+
+def _accepts(request: Request, header: str, token: str) -> bool:
+    return any(part.split(";")[0].strip() == token
+               for part in request.headers.get(header, "").lower().split(","))
+
+
+def encode_response(request: Request, body: dict, to_columns, columnar: bool = False) -> Response:
+    """
+    Serialize a JSON-able result, choosing the layout from the request:
+
+    - Accept: application/x-msgpack -> columnar MessagePack (needs msgpack)
+    - Accept: application/x-npz     -> columnar np.savez_compressed archive
+    - otherwise JSON; columnar when `columnar` is set, the classic rows if not
+
+    `to_columns(body)` builds the columnar form. JSON and MessagePack bodies
+    are brotli / gzip compressed per Accept-Encoding.
+    """
+    if any(_accepts(request, "accept", t) for t in MSGPACK_TYPES):
+        if msgpack is None:
+            raise HTTPException(status_code=406, detail="MessagePack responses need the msgpack package")
+        cols = to_columns(body)
+        cols["columns"] = _to_builtin(cols["columns"])
+        content, media_type = msgpack.packb(cols, use_single_float=True), MSGPACK_TYPES[0]
+    elif _accepts(request, "accept", NPZ_TYPE):
+        # Already deflated; no content coding on top
+        return Response(content=_dumps_npz(to_columns(body)), media_type=NPZ_TYPE,
+                        headers={"Vary": "Accept, Accept-Encoding"})
+    else:
+        content, media_type = dumps_json(to_columns(body) if columnar else body), "application/json"
+
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if len(content) >= COMPRESS_MIN_BYTES:
+        if brotli is not None and _accepts(request, "accept-encoding", "br"):
+            content, headers["Content-Encoding"] = brotli.compress(content, quality=4), "br"
+        elif _accepts(request, "accept-encoding", "gzip"):
+            content, headers["Content-Encoding"] = gzip.compress(content, compresslevel=5), "gzip"
+    return Response(content=content, media_type=media_type, headers=headers)
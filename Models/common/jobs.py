@@ -0,0 +1,172 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "16"))
+JOB_MAX_KEPT = int(os.getenv("JOB_MAX_KEPT", "200"))
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"  # queued | running | done | failed | cancelled
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+        self._cancel = threading.Event()
+
+    def report(self, progress: float):
+        """Progress callback handed to the work function; raises once cancelled."""
+        self.progress = max(0.0, min(1.0, float(progress)))
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed", "cancelled")
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": round(self.progress, 4),
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """
+    Runs long analyses on a bounded thread pool.
+
+    Work functions are called as fn(*args, progress=job.report, **kwargs) and
+    should call progress() regularly; that is where cancellation takes effect.
+    """
+
+    def __init__(self, max_workers: int = JOB_WORKERS, max_pending: int = JOB_MAX_PENDING,
+                 max_kept: int = JOB_MAX_KEPT):
+        self.executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="job")
+        self.max_pending = max_pending
+        self.max_kept = max_kept
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def submit(self, kind: str, fn, *args, **kwargs) -> Job:
+        with self.lock:
+            if self.pending() >= self.max_pending:
+                raise JobQueueFull()
+            job = Job(kind)
+            self.jobs[job.id] = job
+            self._evict()
+        job.future = self.executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def get(self, job_id: str) -> Job:
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Job:
+        job = self.jobs.get(job_id)
+        if job is None or job.finished:
+            return job
+        job._cancel.set()
+        if job.future is not None and job.future.cancel():
+            # never started
+            job.status = "cancelled"
+            job.finished_at = time.time()
+        return job
+
+    def pending(self) -> int:
+        return sum(1 for j in self.jobs.values() if not j.finished)
+
+    def _evict(self):
+        # Drop the oldest finished jobs beyond max_kept
+        finished = [jid for jid, j in self.jobs.items() if j.finished]
+        for jid in finished[:max(0, len(self.jobs) - self.max_kept)]:
+            del self.jobs[jid]
+
+    def _run(self, job: Job, fn, args, kwargs):
+        if job._cancel.is_set():
+            job.status = "cancelled"
+            job.finished_at = time.time()
+            return
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            job.result = fn(*args, progress=job.report, **kwargs)
+            job.progress = 1.0
+            job.status = "done"
+        except JobCancelled:
+            job.status = "cancelled"
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+
+
+def submit_or_429(manager: JobManager, kind: str, fn, *args, **kwargs) -> dict:
+    try:
+        job = manager.submit(kind, fn, *args, **kwargs)
+    except JobQueueFull:
+        raise HTTPException(status_code=429, detail="Too many jobs in flight, retry later")
+    return job.to_dict()
+
+
+def job_router(manager: JobManager, prefix: str = "/jobs") -> APIRouter:
+    """Status / result / cancel endpoints for a JobManager."""
+    router = APIRouter(prefix=prefix)
+
+    def _get(job_id: str) -> Job:
+        job = manager.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return job
+
+    @router.get("")
+    def list_jobs():
+        return [j.to_dict() for j in list(manager.jobs.values())]
+
+    @router.get("/{job_id}")
+    def job_status(job_id: str):
+        return _get(job_id).to_dict()
+
+    @router.get("/{job_id}/result")
+    def job_result(job_id: str):
+        job = _get(job_id)
+        if job.status == "done":
+            return job.result
+        if job.status == "failed":
+            raise HTTPException(status_code=500, detail=job.error)
+        if job.status == "cancelled":
+            raise HTTPException(status_code=410, detail="Job was cancelled")
+        return JSONResponse(status_code=202, content=job.to_dict())
+
+    @router.delete("/{job_id}")
+    def cancel_job(job_id: str):
+        _get(job_id)
+        return manager.cancel(job_id).to_dict()
+
+    return router
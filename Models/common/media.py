@@ -0,0 +1,95 @@
+import mimetypes
+import os
+from email.utils import formatdate, parsedate_to_datetime
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+CHUNK_SIZE = 256 * 1024
+
+
+def _parse_range(header: str, size: int):
+    """Single 'bytes=start-end' range -> (start, end) inclusive, None if unusable, False if unsatisfiable."""
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None  # multi-range: fall back to the whole file
+    start_s, _, end_s = spec.strip().partition("-")
+    try:
+        if start_s == "":
+            length = int(end_s)  # suffix range: last N bytes
+            if length <= 0 or size == 0:
+                return False
+            return max(0, size - length), size - 1
+        start = int(start_s)
+        end = int(end_s) if end_s else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        return False
+    return start, min(end, size - 1)
+
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        return etag in [t.strip() for t in inm.split(",")] or inm.strip() == "*"
+    ims = request.headers.get("if-modified-since")
+    if ims:
+        try:
+            return int(mtime) <= parsedate_to_datetime(ims).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _iter_file(path: str, start: int, length: int):
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def ranged_file_response(request: Request, path: str, media_type: str = None, filename: str = None) -> Response:
+    """
+    Serve a file with byte-range (206) and conditional-GET (304) support,
+    so video players can seek without re-downloading the whole file.
+    """
+    st = os.stat(path)
+    size, mtime = st.st_size, st.st_mtime
+    etag = f'"{int(mtime * 1000):x}-{size:x}"'
+    media_type = media_type or mimetypes.guess_type(path)[0] or "application/octet-stream"
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Last-Modified": formatdate(mtime, usegmt=True),
+    }
+
+    if _not_modified(request, etag, mtime):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and if_range and if_range.strip() not in (etag, headers["Last-Modified"]):
+        range_header = None  # file changed since the client's partial copy
+
+    byte_range = _parse_range(range_header, size) if range_header else None
+    if byte_range is False:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    if byte_range is None:
+        return FileResponse(path, media_type=media_type, filename=filename, headers=headers)
+
+    start, end = byte_range
+    length = end - start + 1
+    headers.update({
+        "Content-Range": f"bytes {start}-{end}/{size}",
+        "Content-Length": str(length),
+    })
+    if filename:
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return StreamingResponse(_iter_file(path, start, length), status_code=206, media_type=media_type,
+                             headers=headers)
@@ -0,0 +1,162 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# prometheus_client is optional; without it /metrics serves sums and counts in the same text format
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+except ImportError:
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+    Histogram = None
+
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+if Histogram is not None:
+    _STAGE = Histogram("franklin_stage_seconds", "Time spent in each pipeline stage",
+                       ["service", "stage"], buckets=STAGE_BUCKETS)
+    _FRAMES = Counter("franklin_frames_processed_total", "Frames processed", ["service", "kind"])
+    _QUEUE = Gauge("franklin_queue_depth", "Items waiting in a queue", ["service", "queue"])
+    _MODEL_LOAD = Gauge("franklin_model_load_seconds", "Time taken to load a model", ["service", "model"])
+
+_lock = threading.Lock()
+_stages = {}   # (service, stage) -> [count, sum]; fallback only
+_frames = {}   # (service, kind) -> count; fallback only
+_instances = []
+
+
+class ServiceMetrics:
+    """
+    Per-service facade over the process-wide metrics:
+
+    - stage(name) / observe(name, s): franklin_stage_seconds{service, stage}
+    - frames(n, kind): franklin_frames_processed_total{service, kind}
+    - track_queue(name, fn): franklin_queue_depth, read from fn() at scrape time
+    - model_loaded(name, s) / track_model_loads(fn): franklin_model_load_seconds
+    """
+
+    def __init__(self, service: str):
+        self.service = service
+        self._queues = {}
+        self._model_loads = {}
+        self._model_load_fns = []
+        with _lock:
+            _instances.append(self)
+
+    def observe(self, stage: str, seconds: float):
+        if Histogram is not None:
+            _STAGE.labels(self.service, stage).observe(seconds)
+            return
+        with _lock:
+            entry = _stages.setdefault((self.service, stage), [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    @contextmanager
+    def stage(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0)
+
+    def timed_iter(self, iterable, stage: str = "decode"):
+        """Re-yield `iterable`, timing each next() as `stage` (e.g. frame decode)."""
+        it = iter(iterable)
+        try:
+            while True:
+                t0 = time.perf_counter()
+                try:
+                    item = next(it)
+                except StopIteration:
+                    return
+                self.observe(stage, time.perf_counter() - t0)
+                yield item
+        finally:
+            close = getattr(it, "close", None)
+            if close:
+                close()
+
+    def frames(self, n: int = 1, kind: str = "processed"):
+        if Histogram is not None:
+            _FRAMES.labels(self.service, kind).inc(n)
+            return
+        with _lock:
+            _frames[(self.service, kind)] = _frames.get((self.service, kind), 0) + n
+
+    def track_queue(self, name: str, fn):
+        self._queues[name] = fn
+
+    def model_loaded(self, name: str, seconds: float):
+        self._model_loads[name] = seconds
+
+    def track_model_loads(self, fn):
+        """fn() -> {model name: load seconds or None}, read at scrape time."""
+        self._model_load_fns.append(fn)
+
+    def _gauges(self):
+        queues = {}
+        for name, fn in self._queues.items():
+            try:
+                queues[name] = float(fn())
+            except Exception:
+                continue
+        loads = dict(self._model_loads)
+        for fn in self._model_load_fns:
+            try:
+                loads.update({k: v for k, v in fn().items() if v is not None})
+            except Exception:
+                continue
+        return queues, loads
+
+
+def render() -> bytes:
+    """Prometheus text exposition for every service in this process."""
+    with _lock:
+        instances = list(_instances)
+
+    if Histogram is not None:
+        for m in instances:
+            queues, loads = m._gauges()
+            for name, value in queues.items():
+                _QUEUE.labels(m.service, name).set(value)
+            for name, value in loads.items():
+                _MODEL_LOAD.labels(m.service, name).set(value)
+        return generate_latest()
+
+    lines = ["# HELP franklin_stage_seconds Time spent in each pipeline stage",
+             "# TYPE franklin_stage_seconds summary"]
+    with _lock:
+        stages = {k: list(v) for k, v in _stages.items()}
+        frames = dict(_frames)
+    for (service, stage), (count, total) in sorted(stages.items()):
+        lines.append(f'franklin_stage_seconds_count{{service="{service}",stage="{stage}"}} {count}')
+        lines.append(f'franklin_stage_seconds_sum{{service="{service}",stage="{stage}"}} {total:.6f}')
+    lines += ["# HELP franklin_frames_processed_total Frames processed",
+              "# TYPE franklin_frames_processed_total counter"]
+    for (service, kind), count in sorted(frames.items()):
+        lines.append(f'franklin_frames_processed_total{{service="{service}",kind="{kind}"}} {count}')
+    lines += ["# HELP franklin_queue_depth Items waiting in a queue", "# TYPE franklin_queue_depth gauge"]
+    gauges = [(m.service, m._gauges()) for m in instances]
+    for service, (queues, _) in gauges:
+        for name, value in sorted(queues.items()):
+            lines.append(f'franklin_queue_depth{{service="{service}",queue="{name}"}} {value}')
+    lines += ["# HELP franklin_model_load_seconds Time taken to load a model",
+              "# TYPE franklin_model_load_seconds gauge"]
+    for service, (_, loads) in gauges:
+        for name, value in sorted(loads.items()):
+            lines.append(f'franklin_model_load_seconds{{service="{service}",model="{name}"}} {value}')
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def metrics_router():
+    """FastAPI router with GET /metrics (Flask services serve render() themselves)."""
+    from fastapi import APIRouter
+    from fastapi.responses import Response
+
+    router = APIRouter()
+
+    @router.get("/metrics")
+    def metrics():
+        return Response(content=render(), media_type=CONTENT_TYPE_LATEST)
+
+    return router
@@ -0,0 +1,68 @@
+import os
+
+import cv2
+import numpy as np
+
+# Fraction of (downscaled) pixels that must change before models run again.
+# 0 (default) = always run; ~0.005 suits fixed cameras. Opt-in because gated
+# frames repeat the last inferred frame's detections.
+MOTION_THRESHOLD = float(os.getenv("MOTION_THRESHOLD", "0"))
+# Per-pixel grey-level difference that counts as a change
+MOTION_PIXEL_DELTA = int(os.getenv("MOTION_PIXEL_DELTA", "25"))
+# Run the models at least every N frames even on a static scene
+MOTION_MAX_GATED = int(os.getenv("MOTION_MAX_GATED", "30"))
+MOTION_WIDTH = 160
+
+
+class MotionGate:
+    """
+    Cheap change detector in front of model inference for fixed cameras.
+
+    Frames are downscaled to MOTION_WIDTH px, greyscaled and blurred, then
+    compared with the last frame the models actually ran on. Comparing with
+    that reference rather than the previous frame also catches slow changes.
+    should_run() is False when the scene is unchanged, and the caller then
+    reuses its last result.
+    """
+
+    def __init__(self, threshold: float = None, pixel_delta: int = MOTION_PIXEL_DELTA,
+                 max_gated: int = MOTION_MAX_GATED, width: int = MOTION_WIDTH):
+        self.threshold = MOTION_THRESHOLD if threshold is None else threshold
+        self.pixel_delta = pixel_delta
+        self.max_gated = max_gated
+        self.width = width
+        self.reference = None
+        self.executed = 0
+        self.gated = 0
+        self._since_run = 0
+
+    def _small(self, frame: np.ndarray) -> np.ndarray:
+        h, w = frame.shape[:2]
+        small = cv2.resize(frame, (self.width, max(1, int(h * self.width / w))), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def should_run(self, frame: np.ndarray) -> bool:
+        if self.threshold <= 0:
+            self.executed += 1
+            return True
+
+        small = self._small(frame)
+        run = (
+            self.reference is None
+            or self.reference.shape != small.shape
+            or self._since_run >= self.max_gated
+            or np.count_nonzero(cv2.absdiff(small, self.reference) > self.pixel_delta) > self.threshold * small.size
+        )
+        if run:
+            self.reference = small
+            self.executed += 1
+            self._since_run = 0
+        else:
+            self.gated += 1
+            self._since_run += 1
+        return run
+
+    def stats(self) -> dict:
+        return {"threshold": self.threshold, "inferred_frames": self.executed, "gated_frames": self.gated}
@@ -0,0 +1,76 @@
+import numpy as np
+
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise IoU between (n, 4) and (m, 4) xyxy boxes -> (n, m)."""
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+
+def threshold_matrix(classes: np.ndarray, iou: float = 0.5, class_iou: dict = None,
+                     cross_iou=None) -> np.ndarray:
+    """
+    Per-pair suppression thresholds for `classes` (n,) -> (n, n).
+
+    class_iou: {class: iou} overrides `iou` for boxes of the same class.
+    cross_iou: None (different classes never suppress each other), a single
+               float for every pair, or {(class_a, class_b): iou} for chosen pairs.
+    """
+    classes = np.asarray(classes)
+    n = classes.shape[0]
+
+    per_box = np.full(n, iou, dtype=np.float32)
+    for cls, t in (class_iou or {}).items():
+        per_box[classes == cls] = t
+
+    same = classes[:, None] == classes[None, :]
+    if cross_iou is None:
+        cross = np.full((n, n), np.inf, dtype=np.float32)
+    elif isinstance(cross_iou, dict):
+        cross = np.full((n, n), np.inf, dtype=np.float32)
+        for (ca, cb), t in cross_iou.items():
+            pair = (classes[:, None] == ca) & (classes[None, :] == cb)
+            cross[pair | pair.T] = t
+    else:
+        cross = np.full((n, n), float(cross_iou), dtype=np.float32)
+
+    return np.where(same, per_box[:, None], cross)
+
+
+def nms(boxes, scores, classes=None, iou: float = 0.5, class_iou: dict = None,
+        cross_iou=None) -> np.ndarray:
+    """
+    Greedy NMS over one array of boxes from any number of models.
+
+    Returns indices of kept boxes, highest score first. A kept box removes
+    every lower-scored box whose IoU with it exceeds the pair's threshold
+    (see threshold_matrix); with classes=None this is plain NMS.
+    """
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    n = boxes.shape[0]
+    if n == 0:
+        return np.empty(0, dtype=np.int64)
+
+    scores = np.asarray(scores, dtype=np.float32).reshape(n)
+    classes = np.zeros(n, dtype=np.int64) if classes is None else np.asarray(classes).reshape(n)
+
+    over = box_iou(boxes, boxes) > threshold_matrix(classes, iou, class_iou, cross_iou)
+
+    order = np.argsort(-scores, kind="stable")
+    suppressed = np.zeros(n, dtype=bool)
+    keep = []
+    for i in order:
+        if suppressed[i]:
+            continue
+        keep.append(i)
+        suppressed |= over[i]
+    return np.asarray(keep, dtype=np.int64)
@@ -0,0 +1,139 @@
+import json
+import os
+import shutil
+import threading
+import time
+
+# Frames per page file of a paged run
+PAGE_SIZE = int(os.getenv("RESULT_PAGE_SIZE", "200"))
+
+# Runs untouched for this long are removed from disk
+PAGES_TTL_HOURS = float(os.getenv("RESULT_PAGES_TTL_HOURS", "24"))
+
+MANIFEST = "manifest.json"
+
+
+def _write_json(path: str, value):
+    # Write-then-rename so readers never see a partial file
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(value, f)
+    os.replace(tmp, path)
+
+
+def _read_json(path: str):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class PagedRun:
+    """
+    Results of one long analysis, written to disk as numbered JSON pages of
+    frames next to a manifest, so memory stays bounded by one page however
+    long the video is.
+
+    The manifest records where the frame after the last written page starts
+    (`resume_from`); a run that was interrupted continues from there.
+    """
+
+    def __init__(self, run_dir: str, page_size: int = PAGE_SIZE):
+        self.dir = run_dir
+        self.page_size = max(1, page_size)
+        os.makedirs(run_dir, exist_ok=True)
+        self.manifest = _read_json(os.path.join(run_dir, MANIFEST)) or {
+            "status": "pending",  # pending | running | done | failed | cancelled
+            "meta": None,
+            "params": None,
+            "pages": 0,
+            "frames": 0,
+            "resume_from": None,
+            "error": None,
+            "updated_at": time.time(),
+        }
+        self._buffer = []
+        self._next = None
+
+    @property
+    def status(self) -> str:
+        return self.manifest["status"]
+
+    @property
+    def resume_from(self):
+        return self.manifest["resume_from"]
+
+    def save(self, **fields):
+        self.manifest.update(fields, updated_at=time.time())
+        _write_json(os.path.join(self.dir, MANIFEST), self.manifest)
+
+    def start(self, meta: dict):
+        """Mark running; the meta of the first attempt is kept on resume."""
+        self.save(status="running", meta=self.manifest["meta"] or meta, error=None)
+
+    def add(self, frame: dict, next_from):
+        """Buffer one frame; `next_from` is where to resume once it is on disk."""
+        self._buffer.append(frame)
+        self._next = next_from
+        if len(self._buffer) >= self.page_size:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        page = self.manifest["pages"]
+        _write_json(self.page_path(page), self._buffer)
+        self.save(pages=page + 1, frames=self.manifest["frames"] + len(self._buffer), resume_from=self._next)
+        self._buffer = []
+
+    def finish(self):
+        self.flush()
+        self.save(status="done", resume_from=None)
+
+    def fail(self, status: str, error: str = None):
+        """Stop as `status` (failed | cancelled); buffered frames are dropped and redone on resume."""
+        self._buffer = []
+        self.save(status=status, error=error)
+
+    def page_path(self, page: int) -> str:
+        return os.path.join(self.dir, f"page-{page:06d}.json")
+
+    def page(self, page: int):
+        """Frames of page `page`, or None when it has not been written."""
+        if page < 0 or page >= self.manifest["pages"]:
+            return None
+        return _read_json(self.page_path(page))
+
+
+class PageStore:
+    """Directory of PagedRuns keyed by run id, with stale runs expiring after `ttl_hours`."""
+
+    def __init__(self, root_dir: str, ttl_hours: float = PAGES_TTL_HOURS, page_size: int = PAGE_SIZE):
+        self.root_dir = root_dir
+        self.ttl = ttl_hours * 3600
+        self.page_size = page_size
+        os.makedirs(root_dir, exist_ok=True)
+
+    def _dir(self, run_id: str) -> str:
+        return os.path.join(self.root_dir, run_id)
+
+    def open(self, run_id: str) -> PagedRun:
+        """The run with this id, created when new."""
+        return PagedRun(self._dir(run_id), self.page_size)
+
+    def get(self, run_id: str):
+        """The existing run with this id, or None."""
+        if not run_id.isalnum() or not os.path.exists(os.path.join(self._dir(run_id), MANIFEST)):
+            return None
+        return PagedRun(self._dir(run_id), self.page_size)
+
+    def evict(self, keep=()):
+        """Remove runs not updated within the TTL, except the ids in `keep`."""
+        cutoff = time.time() - self.ttl
+        for e in os.scandir(self.root_dir):
+            if not e.is_dir() or e.name in keep:
+                continue
+            manifest = _read_json(os.path.join(e.path, MANIFEST))
+            if manifest is None or manifest.get("updated_at", 0) < cutoff:
+                shutil.rmtree(e.path, ignore_errors=True)
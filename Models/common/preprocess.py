@@ -0,0 +1,74 @@
+import os
+
+import cv2
+import numpy as np
+
+# Letterbox each frame once and hand the same tensor to every model with a
+# matching input size (ultralytics otherwise preprocesses per model call)
+SHARED_PREPROCESS = os.getenv("SHARED_PREPROCESS", "1").lower() in ("1", "true", "yes")
+
+PAD_VALUE = (114, 114, 114)
+
+
+def input_signature(model):
+    """
+    (imgsz, stride, rect) a YOLO model expects its input letterboxed to, or
+    None when it must preprocess for itself. `rect` (minimal padding) is only
+    safe for PyTorch weights; exported models may have a fixed input shape.
+    """
+    try:
+        import torch
+    except ImportError:
+        return None
+    overrides = getattr(model, "overrides", None)
+    net = getattr(model, "model", None)
+    if overrides is None or net is None:
+        return None
+    imgsz = overrides.get("imgsz") or 640
+    imgsz = tuple(imgsz) if isinstance(imgsz, (list, tuple)) else (int(imgsz), int(imgsz))
+    pt = isinstance(net, torch.nn.Module)
+    stride = int(max(net.stride)) if pt and hasattr(net, "stride") else 32
+    return imgsz, stride, pt
+
+
+def _letterbox(img, new_shape, stride, auto):
+    # Same geometry as ultralytics' LetterBox (scaleup, centred padding)
+    h, w = img.shape[:2]
+    r = min(new_shape[0] / h, new_shape[1] / w)
+    new_unpad = (int(round(w * r)), int(round(h * r)))
+    dw, dh = new_shape[1] - new_unpad[0], new_shape[0] - new_unpad[1]
+    if auto:
+        dw, dh = dw % stride, dh % stride
+    dw, dh = dw / 2, dh / 2
+    if (w, h) != new_unpad:
+        img = cv2.resize(img, new_unpad, interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
+    left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
+    img = cv2.copyMakeBorder(img, top, bottom, left, right, cv2.BORDER_CONSTANT, value=PAD_VALUE)
+    return img, r, (left, top)
+
+
+class PreparedBatch:
+    """
+    A batch of BGR frames letterboxed into one float BCHW RGB tensor in [0, 1],
+    plus what is needed to map boxes back onto each source frame.
+    """
+
+    def __init__(self, frames, imgsz, stride, rect=True):
+        import torch
+
+        # Minimal padding needs one common shape, as in ultralytics
+        auto = rect and len({f.shape for f in frames}) == 1
+        boxed = [_letterbox(f, imgsz, stride, auto) for f in frames]
+        batch = np.stack([img for img, _, _ in boxed])[..., ::-1].transpose(0, 3, 1, 2)
+        self.tensor = torch.from_numpy(np.ascontiguousarray(batch, dtype=np.float32) / 255.0)
+        self.gains = [r for _, r, _ in boxed]
+        self.pads = [pad for _, _, pad in boxed]
+        self.shapes = [f.shape[:2] for f in frames]
+
+    def unscale(self, i, xyxy):
+        """Box on the tensor -> box on frame i, clipped to it."""
+        r, (px, py), (h, w) = self.gains[i], self.pads[i], self.shapes[i]
+        x1, y1, x2, y2 = xyxy
+        return [min(max((x1 - px) / r, 0.0), w), min(max((y1 - py) / r, 0.0), h),
+                min(max((x2 - px) / r, 0.0), w), min(max((y2 - py) / r, 0.0), h)]
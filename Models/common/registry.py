@@ -0,0 +1,141 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "0"))  # seconds, 0 = off
+
+
+class ModelEntry:
+    def __init__(self, key: str, path: str):
+        self.key = key
+        self.path = path
+        self.model = None
+        self.mtime = None
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self.loaded_at = None
+        self.error = None
+        self.attempted = False
+        # Serializes inference on this model; also held while swapping it
+        self.lock = threading.Lock()
+        self.load_lock = threading.Lock()
+
+    def status(self) -> dict:
+        return {
+            "path": self.path,
+            "loaded": self.model is not None,
+            "load_seconds": self.load_seconds,
+            "warmup_seconds": self.warmup_seconds,
+            "loaded_at": self.loaded_at,
+            "error": self.error,
+        }
+
+
+class ModelRegistry:
+    """
+    Keeps warm model instances keyed by name.
+
+    loader(path) builds a model. Loads are lazy and guarded per model, so
+    concurrent first requests load it once. preload() loads and warms
+    everything up front. reload() swaps in a new file without a restart:
+    the new model is built first and swapped under the inference lock.
+    A watcher thread (MODEL_WATCH_INTERVAL) reloads models whose file changed.
+    """
+
+    def __init__(self, loader, fuse: bool = True, warmup_imgsz: int = 640):
+        self.loader = loader
+        self.fuse = fuse
+        self.warmup_imgsz = warmup_imgsz
+        self.entries = {}
+        self._watcher = None
+
+    def register(self, key: str, path: str):
+        self.entries[key] = ModelEntry(key, path)
+
+    def get(self, key: str):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry.model is None and not entry.attempted:
+            with entry.load_lock:
+                if not entry.attempted:
+                    self._load(entry)
+                    entry.attempted = True
+        return entry.model
+
+    def lock(self, key: str) -> threading.Lock:
+        return self.entries[key].lock
+
+    def preload(self):
+        for key in self.entries:
+            self.get(key)
+
+    def reload(self, key: str, path: str = None) -> dict:
+        entry = self.entries[key]
+        with entry.load_lock:
+            if path:
+                entry.path = path
+            self._load(entry)
+        return entry.status()
+
+    def ready(self) -> bool:
+        return all(e.model is not None for e in self.entries.values())
+
+    def status(self) -> dict:
+        return {key: e.status() for key, e in self.entries.items()}
+
+    def watch(self, interval: float = MODEL_WATCH_INTERVAL):
+        if interval <= 0 or self._watcher is not None:
+            return
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="model-watcher", daemon=True)
+        self._watcher.start()
+
+    def _watch(self, interval: float):
+        while True:
+            time.sleep(interval)
+            for key, entry in list(self.entries.items()):
+                try:
+                    mtime = os.path.getmtime(entry.path)
+                except OSError:
+                    continue
+                if mtime != entry.mtime:
+                    print(f"Model file changed, reloading {key}...")
+                    self.reload(key)
+
+    def _load(self, entry: ModelEntry):
+        # Failed or missing models are only retried by reload() / the watcher
+        if not os.path.exists(entry.path):
+            entry.error = f"Model file not found: {entry.path}"
+            return
+
+        mtime = os.path.getmtime(entry.path)
+        try:
+            print(f"Loading {entry.key} model...")
+            t0 = time.perf_counter()
+            model = self.loader(entry.path)
+            if self.fuse and hasattr(model, "fuse"):
+                try:
+                    model.fuse()
+                except Exception:
+                    pass  # exported/non-PyTorch backends cannot be fused
+            load_seconds = time.perf_counter() - t0
+
+            # First inference pays for lazy init (predictor setup, kernels); do it now
+            t0 = time.perf_counter()
+            model(np.zeros((self.warmup_imgsz, self.warmup_imgsz, 3), dtype=np.uint8), verbose=False)
+            warmup_seconds = time.perf_counter() - t0
+        except Exception as e:
+            print(f"Error loading {entry.key}: {e}")
+            entry.error = str(e)
+            entry.mtime = mtime  # retry once the file changes again
+            return
+
+        with entry.lock:
+            entry.model = model
+        entry.mtime = mtime
+        entry.load_seconds = round(load_seconds, 4)
+        entry.warmup_seconds = round(warmup_seconds, 4)
+        entry.loaded_at = time.time()
+        entry.error = None
@@ -0,0 +1,83 @@
+import json
+import os
+
+import cv2
+import numpy as np
+
+# JSON file of per-camera / per-tank regions: {"<source id>": <spec>, ...}
+# where a spec is {"polygon": [[x, y], ...]} in fractions of the frame size
+# or {"margin": px} (the frame inset by px on every side), plus optional
+# "tile": px to run tiled inference on ROIs larger than one tile.
+ROI_CONFIG = os.getenv("ROI_CONFIG")
+
+# Overlap between neighbouring tiles, as a fraction of the tile size
+ROI_TILE_OVERLAP = float(os.getenv("ROI_TILE_OVERLAP", "0.2"))
+
+_config = None
+
+
+def roi_spec(source_id):
+    """Spec configured for `source_id` in ROI_CONFIG, or None."""
+    global _config
+    if not ROI_CONFIG or source_id is None:
+        return None
+    if _config is None:
+        with open(ROI_CONFIG) as f:
+            _config = json.load(f)
+    return _config.get(source_id)
+
+
+class ROI:
+    """
+    Polygonal region of interest in pixel coordinates of one video.
+
+    Models run on the crop of the polygon's bounding box (or on overlapping
+    tiles of it); callers shift boxes back by the view offset and drop those
+    whose anchor point fails contains().
+    """
+
+    def __init__(self, polygon, width, height, tile=None, tile_overlap=ROI_TILE_OVERLAP):
+        pts = np.asarray(polygon, dtype=np.float32).reshape(-1, 2)
+        pts[:, 0] = np.clip(pts[:, 0], 0, width)
+        pts[:, 1] = np.clip(pts[:, 1], 0, height)
+        self.polygon = pts
+        x0, y0 = np.floor(pts.min(axis=0)).astype(int)
+        x1, y1 = np.ceil(pts.max(axis=0)).astype(int)
+        self.bounds = (int(x0), int(y0), int(max(x1, x0 + 1)), int(max(y1, y0 + 1)))
+        self.tile = int(tile) if tile else None
+        self.tile_overlap = tile_overlap
+
+    @classmethod
+    def from_spec(cls, spec, width, height):
+        """Build from a config spec (see ROI_CONFIG); None when spec is empty."""
+        if not spec:
+            return None
+        if "margin" in spec:
+            m = spec["margin"]
+            polygon = [(m, m), (width - m, m), (width - m, height - m), (m, height - m)]
+        else:
+            polygon = [(x * width, y * height) for x, y in spec["polygon"]]
+        return cls(polygon, width, height, spec.get("tile"), spec.get("tile_overlap", ROI_TILE_OVERLAP))
+
+    def crop(self, frame):
+        """View of the ROI bounding box (no copy)."""
+        x0, y0, x1, y1 = self.bounds
+        return frame[y0:y1, x0:x1]
+
+    def _starts(self, lo, hi):
+        if hi - lo <= self.tile:
+            return [lo]
+        stride = max(1, int(self.tile * (1 - self.tile_overlap)))
+        starts = list(range(lo, hi - self.tile, stride))
+        return starts + [hi - self.tile]
+
+    def views(self, frame):
+        """[(x_offset, y_offset, image)]: the ROI crop, or its tiles when `tile` is set."""
+        x0, y0, x1, y1 = self.bounds
+        if not self.tile:
+            return [(x0, y0, frame[y0:y1, x0:x1])]
+        return [(tx, ty, frame[ty:min(ty + self.tile, y1), tx:min(tx + self.tile, x1)])
+                for ty in self._starts(y0, y1) for tx in self._starts(x0, x1)]
+
+    def contains(self, x, y):
+        return cv2.pointPolygonTest(self.polygon, (float(x), float(y)), False) >= 0
@@ -0,0 +1,41 @@
+import json
+from itertools import chain
+
+from fastapi.responses import StreamingResponse
+
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream",
+}
+
+
+def _encode(fmt: str, event: str, payload: dict) -> bytes:
+    if fmt == "sse":
+        return f"event: {event}\ndata: {json.dumps(payload)}\n\n".encode("utf-8")
+    return (json.dumps({"event": event, **payload}) + "\n").encode("utf-8")
+
+
+def stream_events(events, fmt: str = "ndjson") -> StreamingResponse:
+    """
+    Stream (event, payload) tuples as NDJSON lines or Server-Sent Events.
+
+    The first event is pulled eagerly so setup errors (bad upload, missing
+    model) still surface as a normal HTTP error instead of a broken stream.
+    Errors after that are reported as a final "error" event.
+    """
+    first = next(events)
+
+    def body():
+        try:
+            for event, payload in chain([first], events):
+                yield _encode(fmt, event, payload)
+        except Exception as e:
+            yield _encode(fmt, "error", {"detail": str(e)})
+        finally:
+            events.close()
+
+    return StreamingResponse(
+        body(),
+        media_type=STREAM_MEDIA_TYPES[fmt],
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
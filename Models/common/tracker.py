@@ -0,0 +1,149 @@
+import numpy as np
+
+from common.nms import box_iou
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:  # scipy ships with ultralytics; fall back to greedy matching without it
+    linear_sum_assignment = None
+
+
+def _assign(cost: np.ndarray, valid: np.ndarray):
+    """Minimum-cost matching restricted to `valid` pairs -> (track_idx, det_idx)."""
+    if not valid.any():
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    if linear_sum_assignment is not None:
+        gated = np.where(valid, cost, cost[valid].max() + 1e6)
+        r, c = linear_sum_assignment(gated)
+        ok = valid[r, c]
+        return r[ok], c[ok]
+
+    rows, cols = [], []
+    used_r, used_c = set(), set()
+    for flat in np.argsort(np.where(valid, cost, np.inf), axis=None):
+        r, c = np.unravel_index(flat, cost.shape)
+        if not valid[r, c]:
+            break
+        if r in used_r or c in used_c:
+            continue
+        used_r.add(r)
+        used_c.add(c)
+        rows.append(r)
+        cols.append(c)
+    return np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)
+
+
+class Tracker:
+    """
+    Multi-object tracker with array-backed state and optimal assignment.
+
+    Each update() matches detections to live tracks by point distance
+    (metric="distance", gated at max_distance) or box overlap
+    (metric="iou", gated at min_iou), then starts tracks for the rest.
+    Tracks not seen for max_age seconds as of the previous update() are
+    dropped, so a detection can still match a track when the sampling stride
+    is max_age or longer.
+
+    Track state lives in parallel arrays (ids, pos, start_pos, boxes,
+    first_seen, last_seen, hits); update() returns the row of each detection
+    in those arrays, valid until the next update().
+    """
+
+    def __init__(self, max_distance: float = 12.0, max_age: float = 2.0, metric: str = "distance",
+                 min_iou: float = 0.3):
+        if metric not in ("distance", "iou"):
+            raise ValueError(f"Unknown tracker metric: {metric}")
+        self.max_distance = max_distance
+        self.max_age = max_age
+        self.metric = metric
+        self.min_iou = min_iou
+        self._next_id = 0
+        self._last_update = None
+
+        self.ids = np.empty(0, dtype=np.int64)
+        self.pos = np.empty((0, 2), dtype=np.float32)
+        self.start_pos = np.empty((0, 2), dtype=np.float32)
+        self.boxes = np.empty((0, 4), dtype=np.float32)
+        self.first_seen = np.empty(0, dtype=np.float64)
+        self.last_seen = np.empty(0, dtype=np.float64)
+        self.hits = np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return self.ids.shape[0]
+
+    def update(self, timestamp: float, points=None, boxes=None) -> np.ndarray:
+        """
+        points: (n, 2) positions, required for metric="distance"
+        boxes:  (n, 4) xyxy boxes, required for metric="iou"
+        Returns (n,) track rows, one per detection.
+        """
+        # Expire against the previous update, i.e. after that update's matching
+        if self._last_update is not None:
+            self._expire(self._last_update)
+        self._last_update = timestamp
+
+        n = len(points) if points is not None else len(boxes) if boxes is not None else 0
+        points = np.asarray(points, dtype=np.float32).reshape(-1, 2) if points is not None else np.zeros((n, 2), np.float32)
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4) if boxes is not None else np.zeros((n, 4), np.float32)
+
+        rows = np.full(n, -1, dtype=np.int64)
+        if len(self) and n:
+            if self.metric == "iou":
+                overlap = box_iou(self.boxes, boxes)
+                cost, valid = 1.0 - overlap, overlap >= self.min_iou
+            else:
+                cost = np.linalg.norm(self.pos[:, None, :] - points[None, :, :], axis=2)
+                valid = cost < self.max_distance
+            t_idx, d_idx = _assign(cost, valid)
+            rows[d_idx] = t_idx
+
+            self.pos[t_idx] = points[d_idx]
+            self.boxes[t_idx] = boxes[d_idx]
+            self.last_seen[t_idx] = timestamp
+            self.hits[t_idx] += 1
+
+        new = np.flatnonzero(rows < 0)
+        if new.size:
+            rows[new] = np.arange(len(self), len(self) + new.size)
+            self.ids = np.concatenate([self.ids, np.arange(self._next_id, self._next_id + new.size)])
+            self._next_id += new.size
+            self.pos = np.concatenate([self.pos, points[new]])
+            self.start_pos = np.concatenate([self.start_pos, points[new]])
+            self.boxes = np.concatenate([self.boxes, boxes[new]])
+            self.first_seen = np.concatenate([self.first_seen, np.full(new.size, timestamp)])
+            self.last_seen = np.concatenate([self.last_seen, np.full(new.size, timestamp)])
+            self.hits = np.concatenate([self.hits, np.ones(new.size, dtype=np.int64)])
+
+        return rows
+
+    def _expire(self, timestamp: float):
+        alive = (timestamp - self.last_seen) < self.max_age
+        if alive.all():
+            return
+        self.ids = self.ids[alive]
+        self.pos = self.pos[alive]
+        self.start_pos = self.start_pos[alive]
+        self.boxes = self.boxes[alive]
+        self.first_seen = self.first_seen[alive]
+        self.last_seen = self.last_seen[alive]
+        self.hits = self.hits[alive]
+
+
+class NestDwellRule:
+    """
+    A turtle track becomes a nest once it has been seen for at least
+    time_threshold seconds without moving more than movement_limit from
+    where the track started.
+    """
+
+    def __init__(self, time_threshold: float, movement_limit: float):
+        self.time_threshold = time_threshold
+        self.movement_limit = movement_limit
+
+    def check(self, tracker: Tracker, rows: np.ndarray) -> np.ndarray:
+        """(n,) bool: whether each tracked detection (by row) is a nest."""
+        rows = np.asarray(rows, dtype=np.int64)
+        duration = tracker.last_seen[rows] - tracker.first_seen[rows]
+        moved = np.linalg.norm(tracker.pos[rows] - tracker.start_pos[rows], axis=1)
+        return (duration >= self.time_threshold) & (moved <= self.movement_limit)
@@ -0,0 +1,90 @@
+import json
+import os
+from tempfile import NamedTemporaryFile
+
+from fastapi import HTTPException, UploadFile
+
+from common.cache import SizeLimitExceeded, copy_hashed
+
+
+def mb_env(name: str, default_mb: int) -> int:
+    """Byte limit from an env var given in MB."""
+    return int(float(os.getenv(name, str(default_mb))) * 1024 * 1024)
+
+
+class UploadLimitMiddleware:
+    """
+    ASGI middleware that answers 413 before a too-large request body is parsed:
+    immediately when Content-Length is over the limit, otherwise as soon as the
+    streamed body passes it. `path_limits` maps request paths to tighter limits.
+    """
+
+    def __init__(self, app, max_bytes: int, path_limits: dict = None):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_limits = path_limits or {}
+
+    async def _reject(self, send, limit):
+        body = json.dumps({"detail": f"Upload too large (limit {limit // (1024 * 1024)} MB)."}).encode("utf-8")
+        await send({"type": "http.response.start", "status": 413,
+                    "headers": [(b"content-type", b"application/json"), (b"connection", b"close"),
+                                (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT"):
+            return await self.app(scope, receive, send)
+
+        limit = self.path_limits.get(scope["path"], self.max_bytes)
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > limit:
+            return await self._reject(send, limit)
+
+        received = 0
+        started = rejected = False
+
+        async def limited_receive():
+            # Past the limit: answer 413 ourselves and tell the app the client left
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit and not started:
+                    rejected = True
+                    await self._reject(send, limit)
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            nonlocal started
+            if rejected:
+                return  # the 413 has been sent; drop whatever the app answers
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        await self.app(scope, limited_receive, guarded_send)
+
+
+def spool_upload(file: UploadFile, max_bytes: int, suffix: str = "") -> tuple:
+    """
+    Stream an upload to a temp file in chunks, hashing as it goes.
+    Returns (path, size, sha256 hex); 413 past `max_bytes`, 400 when empty.
+    The caller removes the file.
+    """
+    with NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+        path = tmp.name
+        try:
+            size, sha = copy_hashed(file.file, tmp, max_bytes=max_bytes)
+        except SizeLimitExceeded:
+            tmp.close()
+            os.remove(path)
+            raise HTTPException(status_code=413,
+                                detail=f"Upload too large (limit {max_bytes // (1024 * 1024)} MB).")
+
+    if size == 0:
+        os.remove(path)
+        raise HTTPException(status_code=400, detail="Empty file received.")
+    return path, size, sha
@@ -0,0 +1,92 @@
+import os
+import cv2
+
+# Strides at or above this many frames seek instead of grabbing every frame
+SEEK_THRESHOLD = int(os.getenv("SAMPLER_SEEK_THRESHOLD", "60"))
+
+# Sampling rate while nothing is happening, for activity-adaptive sampling
+ADAPTIVE_IDLE_FPS = float(os.getenv("ADAPTIVE_IDLE_FPS", "1.0"))
+
+
+def stride_for(fps: float, step: int = 1, sample_fps: float = None) -> int:
+    """
+    Resolve the sampling stride in frames.
+    A target `sample_fps` wins over a fixed `step` when both are given.
+    """
+    if sample_fps:
+        return max(1, int(round(fps / sample_fps)))
+    return max(1, int(step))
+
+
+def idle_stride(fps: float, active_step: int, idle_fps: float = ADAPTIVE_IDLE_FPS) -> int:
+    """
+    Coarse stride for ~`idle_fps` samples/s, rounded to a multiple of
+    `active_step` so idle samples land on the same grid as dense ones.
+    """
+    return active_step * max(1, int(round(fps / idle_fps / active_step)))
+
+
+class AdaptiveStride:
+    """
+    Activity-adaptive stride: `idle_step` while nothing happens, `active_step`
+    from an active sample until `hold` quiet samples have passed.
+    Feed update() the activity of each sample and apply the returned stride.
+    """
+
+    def __init__(self, active_step: int, idle_step: int, hold: int = 3):
+        self.active_step = active_step
+        self.idle_step = idle_step
+        self.hold = hold
+        self.step = idle_step
+        self._quiet = hold
+
+    def update(self, active: bool) -> int:
+        self._quiet = 0 if active else self._quiet + 1
+        self.step = self.active_step if self._quiet < self.hold else self.idle_step
+        return self.step
+
+
+class FrameSampler:
+    """
+    Iterate every `step`-th frame of a cv2.VideoCapture as (frame_idx, frame).
+
+    Frames in between are advanced with cap.grab(), which skips the
+    retrieve/color-conversion work cap.read() does for every frame. When the
+    stride is large (>= seek_threshold) we seek with CAP_PROP_POS_FRAMES
+    instead and only fall back to grabbing if the backend refuses the seek.
+
+    `step` is read on every iteration, so callers may change it mid-video.
+    """
+
+    def __init__(self, cap, step: int = 1, start_frame: int = 0, end_frame: int = None,
+                 seek_threshold: int = SEEK_THRESHOLD):
+        self.cap = cap
+        self.step = max(1, int(step))
+        self.start_frame = max(0, int(start_frame))
+        self.end_frame = end_frame
+        self.seek_threshold = seek_threshold
+
+    def __iter__(self):
+        cap = self.cap
+        idx = self.start_frame
+        if idx > 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+
+        while self.end_frame is None or idx < self.end_frame:
+            ok, frame = cap.read()
+            if not ok:
+                return
+            yield idx, frame
+
+            nxt = idx + self.step
+            if self.end_frame is not None and nxt >= self.end_frame:
+                return
+
+            if self.step >= self.seek_threshold and cap.set(cv2.CAP_PROP_POS_FRAMES, nxt):
+                idx = nxt
+                continue
+
+            for _ in range(self.step - 1):
+                if not cap.grab():
+                    return
+            idx = nxt
@@ -0,0 +1,44 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.tracker import NestDwellRule, Tracker
+
+
+def _nest_flags(stride, max_age=2.0, threshold=10.0, samples=6):
+    tracker = Tracker(max_distance=12.0, max_age=max_age)
+    rule = NestDwellRule(time_threshold=threshold, movement_limit=12.0)
+    flags = []
+    for i in range(samples):
+        rows = tracker.update(i * stride, points=[[100.0, 200.0]])
+        flags.append(bool(rule.check(tracker, rows)[0]))
+    return flags, tracker
+
+
+def test_stationary_track_survives_stride_longer_than_max_age():
+    flags, tracker = _nest_flags(stride=4.0)
+    assert len(tracker) == 1
+    assert flags == [False, False, False, True, True, True]
+
+
+def test_stride_equal_to_max_age_keeps_track():
+    flags, tracker = _nest_flags(stride=2.0, samples=7)
+    assert len(tracker) == 1
+    assert flags[-2:] == [True, True]
+
+
+def test_short_stride_matches():
+    flags, _ = _nest_flags(stride=1.0, samples=12)
+    assert flags.index(True) == 10
+
+
+def test_unmatched_track_expires_after_max_age():
+    tracker = Tracker(max_distance=12.0, max_age=2.0)
+    tracker.update(0.0, points=[[0.0, 0.0]])
+    tracker.update(1.0, points=np.empty((0, 2)))
+    tracker.update(3.0, points=[[500.0, 500.0]])
+    tracker.update(3.5, points=np.empty((0, 2)))
+    assert list(tracker.ids) == [1]